@@ -15,6 +15,10 @@ import subprocess  # New import for running rpicam-vid
 import sys  # New import for sys.stderr
 import stat  # New import for checking FIFO
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame_ring import FrameRing  # Shared-memory frame slots (repo root)
+from rolling_window import RollingWindow, TimeEma  # Time-based windows / smoothing (repo root)
+
 # Define the path for the named pipe
 PIPE_PATH = '/tmp/rpicam_fifo'  # Using /tmp is generally safe for temporary files
 
@@ -112,6 +116,11 @@ if not camera_opened:
     sys.exit(1)
 # --- End: Camera Initialization with rpicam-vid streaming ---
 
+# Decode every frame straight into a preallocated shared-memory slot (no per-frame allocation).
+# Other processes can attach with FrameRing.attach(ring.spec()).
+ring = FrameRing.create(test_frame.shape, test_frame.dtype, slots=4, readers=1)
+print(f"Frame ring: {ring.spec()}", file=sys.stderr)
+
 detector = FaceMeshDetector(maxFaces=1)
 plotY = LivePlot(640, 480, [20, 50])
 
@@ -144,12 +153,23 @@ else:
 #led = LED(17)
 
 idList = [22, 23, 24, 26, 110, 157, 158, 159, 160, 161, 130, 243]  # 252,253,254,339,384,385,386,387,388]
-Ratiolist = []
-Overtime = []
+# Rule timings in seconds, driven by frame timestamps (the frame counts they replace assumed 60 fps)
+SMOOTH_SECONDS = 3 / 60  # Ratio EMA time constant (was a 3-frame average)
+BLINK_WINDOW_SECONDS = 60  # Blinks counted over the last minute (was 3600 frames)
+BLINK_COOLDOWN_SECONDS = 15 / 60
+EYES_CLOSED_SECONDS = 60 / 60
+ALARM_COOLDOWN_SECONDS = 100 / 60
+SLOW_BLINK_LEVEL = 100 / 60  # Accumulator: +3 per second closed, -1 per second open
+MAX_FRAME_GAP = 0.5  # A frame never accounts for more time than this
+
+RatioEma = TimeEma(SMOOTH_SECONDS)
+Overtime = RollingWindow(BLINK_WINDOW_SECONDS)  # One sample per blink
+OvertimeStart = None
 blinkcounter = 0
-blinkcooldown = 0
+LastBlink = None
 Threshold = 34
-EyeClosed = 0
+EyeClosedSince = None
+LastFrameTime = None
 Alarm = False
 Existingalarm = False
 Test = 0
@@ -158,12 +178,16 @@ Mainmenu = False
 Trigger = False
 Alert = None
 Sampled = False
-Alarmcooldown = 100
-slowblinking = 0
+LastAlarm = None
+slowblinking = 0.0
 slowblinkingcounter = 0
 slowblinked = 0
 
 
+def alarm_ready(now):
+    return LastAlarm is None or now - LastAlarm > ALARM_COOLDOWN_SECONDS
+
+
 class DrowsinessAlert:
     def __init__(self):
         self.root = tk.Toplevel() if tk._default_root else tk.Tk()
@@ -322,10 +346,17 @@ while True:
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
     if Operating == True:
-        success, img = cap.read()
+        slot = ring.begin_write()
+        success, img = cap.read(slot)
         if not success:
+            ring.abort()
             print("Failed to grab frame. Exiting loop.", file=sys.stderr)
             break
+        if img is not slot:
+            np.copyto(slot, img)
+            img = slot
+        FrameTime = time.monotonic()
+        ring.commit(FrameTime)
 
         img, faces = detector.findFaceMesh(img, draw=True)
         if faces:
@@ -341,48 +372,46 @@ while True:
             cv2.line(img, leftUp, leftDown, (0, 200, 0), 3)
             cv2.line(img, leftleft, leftright, (0, 200, 0), 3)
             ratio = (LenghtVertical / LenghtHorizontal) * 100
-            Ratiolist.append(ratio)
-            if len(Ratiolist) > 3:
-                Ratiolist.pop(0)
-            AverageRatio = sum(Ratiolist) / len(Ratiolist)
-            if len(Overtime) > 3600:  # considering 60fps, 1 minute
-                Overtime.pop(0)
+            AverageRatio = RatioEma.update(FrameTime, ratio)
+            FrameDelta = min(FrameTime - LastFrameTime, MAX_FRAME_GAP) if LastFrameTime is not None else 0.0
+            LastFrameTime = FrameTime
+            if OvertimeStart is None:
+                OvertimeStart = FrameTime
+            Overtime.expire(FrameTime)
+            if FrameTime - OvertimeStart > BLINK_WINDOW_SECONDS:  # A full minute observed
                 Sampled = True
-            SumOvertime = sum(Overtime)
-            Alarmcooldown += 1
+            SumOvertime = Overtime.count
             #led.off()----------------------------
-            if 7 > SumOvertime > 3 and Alarm == False and Sampled == True and Alarmcooldown > 100:
+            if 7 > SumOvertime > 3 and Alarm == False and Sampled == True and alarm_ready(FrameTime):
                 Alarm = True
                 Sampled = False
                 SumOvertime = 0
-            if AverageRatio < Threshold and blinkcooldown > 15:
+            if AverageRatio < Threshold and (LastBlink is None or FrameTime - LastBlink > BLINK_COOLDOWN_SECONDS):
                 blinkcounter += 1
-                blinkcooldown = 0
-                Overtime.append(1)
-            else:
-                blinkcooldown += 1
-                Overtime.append(0)
+                LastBlink = FrameTime
+                Overtime.add(FrameTime)
             if AverageRatio < Threshold:  # eye closed
-                EyeClosed += 1
-                slowblinking += 3
+                if EyeClosedSince is None:
+                    EyeClosedSince = FrameTime
+                slowblinking += 3 * FrameDelta
             else:
-                EyeClosed = 0
-                slowblinking -= 1
+                EyeClosedSince = None
+                slowblinking -= FrameDelta
                 slowblinked = 0
-            if EyeClosed > 60:
+            if EyeClosedSince is not None and FrameTime - EyeClosedSince > EYES_CLOSED_SECONDS:
                 Alarm = True
-                EyeClosed = 0
+                EyeClosedSince = FrameTime
             if slowblinking < 0:
                 slowblinking = 0
-            if slowblinking > 100 and slowblinked == 0:
+            if slowblinking > SLOW_BLINK_LEVEL and slowblinked == 0:
                 slowblinked = 1
                 slowblinkingcounter += 1
-            if slowblinkingcounter > 20 and Alarm == False and Alarmcooldown > 100:
+            if slowblinkingcounter > 20 and Alarm == False and alarm_ready(FrameTime):
                 Alarm = True
                 slowblinking = 0
                 slowblinkingcounter = 0
 
-            if Alarmcooldown < 100:
+            if not alarm_ready(FrameTime):
                 Alarm = False
 
             print(slowblinking)
@@ -396,8 +425,8 @@ while True:
         cv2.imshow("DrowsyCam", imagestack)
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
-    if Alarm == True and Existingalarm == False and Alarmcooldown > 100:
-        Alarmcooldown = 0
+    if Alarm == True and Existingalarm == False and alarm_ready(time.monotonic()):
+        LastAlarm = time.monotonic()
         Existingalarm = True
         Alert = DrowsinessAlert()
         Alert.bring_to_front()
@@ -410,6 +439,7 @@ while True:
 
 cap.release()
 cv2.destroyAllWindows()
+ring.close()
 
 if rpicam_process:
     rpicam_process.terminate()
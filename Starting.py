@@ -1,119 +1,27 @@
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
 import os
 import cv2
-import smbus
 from cvzone.FaceMeshModule import FaceMeshDetector
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
 from collections import deque
 import time
 import pygame
-
-
-# --- HARDWARE CHECK ---
-pygame.mixer.init()
-pygame.mixer.music.load("alarm.wav")
-pygame.mixer.music.set_volume(1.0)
-
-
-GPIO_AVAILABLE = False
-try:
-    from gpiozero import OutputDevice
-
-    test_led = OutputDevice(17, active_high=True)
-    test_led.close()
-    GPIO_AVAILABLE = True
-
-except Exception as e:
-    print("GPIO INIT FAILED:", e)
-
-
-# --- MPU6050/9250 VEHICLE DYNAMICS CLASS ---
-class MPU_Sensor:
-    def __init__(self, address=0x68):
-        self.bus = smbus.SMBus(1)
-        self.address = address
-        self.connected = False
-        self.speed_kph = 0.0
-        self.last_time = time.time()
-
-        # New variables for smoothing
-        self.turn_timer = 0
-        self.turn_direction = "TURNING"
-
-        try:
-            # Wake up MPU
-            self.bus.write_byte_data(self.address, 0x6B, 0)
-            self.connected = True
-            print("MPU Connected: Vehicle Dynamics Active")
-        except:
-            print("MPU Not Found: Vehicle Logic Disabled")
-
-    def read_raw_data(self, addr):
-        high = self.bus.read_byte_data(self.address, addr)
-        low = self.bus.read_byte_data(self.address, addr + 1)
-        value = ((high << 8) | low)
-        if (value > 32768): value = value - 65536
-        return value
-
-    def get_vehicle_status(self):
-        """ Returns: status_string, speed_kph """
-        # --- SIMULATION MODE ---
-        if not self.connected:
-            return "DRIVING", 65.0
-
-        # --- REAL SENSOR MODE ---
-        try:
-            # Read Raw Data
-            acc_y = self.read_raw_data(0x3D) / 16384.0
-            gyro_z = self.read_raw_data(0x47) / 131.0
-            now = time.time()
-
-            # --- 1. SMOOTH TURN LOGIC ---
-            # Threshold: 15 degrees/sec
-            if abs(gyro_z) > 15:
-                self.turn_timer = now
-                # Detect Left vs Right (Standard MPU: + is Left, - is Right)
-                # If this is backward for your car, swap the words below.
-                if gyro_z > 0:
-                    self.turn_direction = "TURNING LEFT"
-                else:
-                    self.turn_direction = "TURNING RIGHT"
-
-            # Hysteresis: Hold the status for 1.0s to prevent flickering
-            if now - self.turn_timer < 1.0:
-                return self.turn_direction, self.speed_kph
-
-            # --- 2. SPEED LOGIC ---
-            dt = now - self.last_time
-            self.last_time = now
-
-            # Physics Integration (accel -> speed)
-            # Ignore tiny noise < 0.05g
-            if acc_y > 0.05:
-                self.speed_kph += (acc_y * 9.8 * dt) * 3.6 * 2
-            elif acc_y < -0.05:
-                self.speed_kph -= (abs(acc_y) * 9.8 * dt) * 3.6 * 3
-            else:
-                self.speed_kph *= 0.99  # Friction simulation
-
-            # Clamp Speed
-            if self.speed_kph < 0: self.speed_kph = 0
-            if self.speed_kph > 200: self.speed_kph = 200
-
-            # --- 3. STATUS DECISION ---
-            if self.speed_kph < 3.0:
-                self.speed_kph = 0
-                return "STATIONARY", 0
-
-            if acc_y > 0.15: return "ACCELERATING", self.speed_kph
-
-            return "DRIVING", self.speed_kph
-
-        except:
-            return "ERROR", 0
+from camera_stream import CameraStream
+from inference_pipeline import InferencePipeline
+from mpu_sensor import MPU_Sensor, ImuSampler, open_bus
+from imu_trace import RecordingBus, TraceWriter
+from eye_tracker import EyeTracker
+from event_log import EventLog
+from driver_store import DEFAULT_DB, DriverStore
+from frame_governor import FrameGovernor
+from drowsiness_engine import DrowsinessEngine, PRE_WARNING, ALARM, PERCLOS_LIMIT, SMOOTH_SECONDS
+from eye_metrics import DEFAULT_RATIO_SOURCE, EYE_LANDMARKS, RATIO_SOURCES, ratio_function
+from stage_timer import StageTimer
+from rolling_window import TimeEma
+from session_recorder import SESSION_EXTENSION, SessionRecorder
+from sparkline import Sparkline
+from ui_bindings import UiBindings
+from video_renderer import VideoRenderer
 
 
 # --- CONFIGURATION ---
@@ -130,56 +38,147 @@ THEME = {
     "info": "#a29bfe"
 }
 
+# Eye ratio new profiles are calibrated with ("lid" or "ear", see eye_metrics.RATIO_SOURCES);
+# the registration screen can switch it, the operation screen uses the profile's
+RATIO_SOURCE = os.environ.get("DROWSYCAM_RATIO_SOURCE", DEFAULT_RATIO_SOURCE)
+
+# Run face mesh in a separate worker process reading the shared-memory frame ring
+USE_INFERENCE_PROCESS = os.environ.get("DROWSYCAM_INFERENCE_PROCESS", "0") == "1"
+
+# Full face mesh every N frames, optical-flow eye tracking in between (operation screen)
+USE_EYE_TRACKING = os.environ.get("DROWSYCAM_EYE_TRACKING", "0") == "1"
+TRACK_REFRESH_FRAMES = 10
+
+# Lower the camera rate while detection is paused or the CPU runs hot (operation screen)
+USE_FRAME_GOVERNOR = os.environ.get("DROWSYCAM_GOVERNOR", "1") == "1"
+
+# Driver profiles, calibrations and alarm history; old .txt profiles in the working directory
+# are imported into it on first start
+DB_PATH = os.environ.get("DROWSYCAM_DB", DEFAULT_DB)
+
+# Append every raw accel/gyro sample to this trace file (replay with imu_trace.py); empty = off
+IMU_TRACE_PATH = os.environ.get("DROWSYCAM_IMU_TRACE", "")
+
+# Record every processed frame (landmarks, eye ratio, vehicle state, alarms) of each drive into this
+# directory, replayable with replay.py; empty = off. SESSION_VIDEO adds a downsampled video next to it.
+SESSION_DIR = os.environ.get("DROWSYCAM_SESSION_DIR", "")
+SESSION_VIDEO = os.environ.get("DROWSYCAM_SESSION_VIDEO", "0") == "1"
+SESSION_VIDEO_FPS = 10
+
+# Detection handles every new camera frame (polled every DETECT_POLL_MS); video and dashboard
+# repaint at most UI_FPS times a second. UI_FPS=0 repaints after every processed frame.
+DETECT_POLL_MS = 5
+UI_FPS = float(os.environ.get("DROWSYCAM_UI_FPS", "15"))
+
+# Frame-loop timing probes (PERF overlay + periodic log line)
+PERF_STAGES = ("period", "capture", "inference", "vehicle", "rules", "record", "resize", "tk_image", "labels", "plot")
+PERF_LOG_SECONDS = 30
+
+# EAR graph: one point per this much capture time, whatever the camera frame rate
+GRAPH_SAMPLE_SECONDS = 0.05
+
 # --- GLOBAL VARIABLES ---
 current_state = None
 selected_driver = None
 driver_threshold = 0.25
 driver_closed_eye = 0.20
 driver_open_eye = 0
+driver_ratio_source = DEFAULT_RATIO_SOURCE
 Motors = None
-cap = cv2.VideoCapture(0)
-detector = FaceMeshDetector(maxFaces=1)
-mpu = MPU_Sensor()
+GPIO_AVAILABLE = False
+
+# Hardware handles, opened in __main__ (a spawned inference worker re-imports this module)
+cap = None
+camera = None
+detector = None
+mpu = None
+imu_trace = None
+inference = None
+tracker = None
+governor = None
+recorder = None  # SessionRecorder of the current drive
+store = None  # DriverStore
+event_log = None  # Alarm history, committed to the store in batches by a background writer
 
 alarm_playing = False
 alarm_fade_start = None
 
 
-ratio_history = deque(maxlen=50)
-smooth_ear_buffer = deque(maxlen=6)
+perf = StageTimer(PERF_STAGES)
+
+ratio_history = deque(maxlen=50)  # One point per GRAPH_SAMPLE_SECONDS
+smooth_ear = TimeEma(SMOOTH_SECONDS)  # Registration screen
 
 
 # --- UTILS ---
 
 def log_alarm_event(reason):
-    if not selected_driver:
+    if not selected_driver or not event_log:
         return
+    # Queued for the writer thread
+    event_log.log(selected_driver, "ALARM", reason)
 
-    filename = f"{selected_driver.replace(' ', '_')}.txt"
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-
-    try:
-        with open(filename, "r") as f:
-            content = f.read()
+def draw_eye_landmarks(frame, face, sx=1.0, sy=1.0, ids=EYE_LANDMARKS):
+    if not face:
+        return
+    pts = {i: (int(face[i][0] * sx), int(face[i][1] * sy)) for i in set(ids).union(EYE_LANDMARKS)}
+    for p in pts.values():
+        cv2.circle(frame, p, 3, (255, 0, 255), cv2.FILLED)
+    cv2.line(frame, pts[159], pts[23], (0, 200, 0), 2)
+    cv2.line(frame, pts[130], pts[243], (0, 200, 0), 2)
 
-        if "--- HISTORY ---" not in content:
-            content += "\n--- HISTORY ---\n"
+def clear_window():
+    for w in root.winfo_children(): w.destroy()
 
-        content += f"{timestamp} | {reason}\n"
+def start_session_recording(engine):
+    global recorder
+    stop_session_recording()
+    try:
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        base = os.path.join(SESSION_DIR, f"{selected_driver.replace(' ', '_')}_{time.strftime('%Y%m%d_%H%M%S')}")
+        meta = {"driver": selected_driver, "threshold": driver_threshold, "closed_eye": driver_closed_eye,
+                "open_eye": driver_open_eye, "ratio_source": driver_ratio_source}
+        recorder = SessionRecorder(base + SESSION_EXTENSION, meta,
+                                   video_path=base + ".avi" if SESSION_VIDEO else None, video_fps=SESSION_VIDEO_FPS)
+        engine.subscribe(recorder.on_event)
+    except Exception as e:
+        print("SESSION RECORDING DISABLED:", e)
 
-        with open(filename, "w") as f:
-            f.write(content)
 
-    except Exception as e:
-        print("History write failed:", e)
+def stop_session_recording():
+    global recorder
+    if recorder:
+        try:
+            recorder.close()
+        except Exception as e:
+            print("Session recording error:", e)
+        recorder = None
 
-def clear_window():
-    for w in root.winfo_children(): w.destroy()
 
 def on_close():
     print("Shutting down safely...")
 
+    stop_session_recording()
+    if event_log:
+        event_log.close()
+    if store:
+        store.close()
+
+    try:
+        if inference:
+            inference.stop()
+    except:
+        pass
+
     try:
+        mpu.stop()
+        if imu_trace:
+            imu_trace.close()
+    except:
+        pass
+
+    try:
+        camera.stop()
         if cap.isOpened():
             cap.release()
     except:
@@ -245,9 +244,12 @@ def create_keyboard(parent, entry):
 
 
 def set_state(name, **kwargs):
-    global current_state, selected_driver, driver_threshold, driver_closed_eye, driver_open_eye
+    global current_state, selected_driver, driver_threshold, driver_closed_eye, driver_open_eye, driver_ratio_source
     current_state = name
+    stop_session_recording()
     clear_window()
+    if camera is not None:
+        camera.min_interval = 0.0  # Only the operation screen throttles the camera
     if name == "start":
         build_start_screen()
     elif name == "driver_selection":
@@ -261,6 +263,7 @@ def set_state(name, **kwargs):
         driver_threshold = kwargs.get("threshold", 0.25)
         driver_closed_eye = kwargs.get("closed_eye", 0.20)
         driver_open_eye = kwargs.get("open_eye", 0.40)
+        driver_ratio_source = kwargs.get("ratio_source", DEFAULT_RATIO_SOURCE)
         build_operation_screen()
 
 
@@ -286,7 +289,8 @@ def build_history_screen():
             driver=selected_driver,
             threshold=driver_threshold,
             closed_eye=driver_closed_eye,
-            open_eye=driver_open_eye
+            open_eye=driver_open_eye,
+            ratio_source=driver_ratio_source
         )
     ).pack(side="left")
 
@@ -320,16 +324,11 @@ def build_history_screen():
     scrollbar.pack(side="right", fill="y")
     text.configure(yscrollcommand=scrollbar.set)
 
-    filename = f"{selected_driver.replace(' ', '_')}.txt"
-
     try:
-        with open(filename, "r") as f:
-            content = f.read()
-
-        if "--- HISTORY ---" in content:
-            history = content.split("--- HISTORY ---", 1)[1].strip()
-        else:
-            history = "No alarm history recorded."
+        # Alarms still queued in the event log show up next time; the index keeps this fast
+        events = store.history(selected_driver)
+        history = "\n".join(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))} | {reason}"
+                            for ts, kind, reason in events if kind == "ALARM") or "No alarm history recorded."
 
     except:
         history = "Unable to load history."
@@ -351,7 +350,8 @@ def build_history_screen():
             driver=selected_driver,
             threshold=driver_threshold,
             closed_eye=driver_closed_eye,
-            open_eye=driver_open_eye
+            open_eye=driver_open_eye,
+            ratio_source=driver_ratio_source
         )
     ).pack(pady=20)
 
@@ -379,29 +379,25 @@ def build_driver_selection_screen():
     canvas.pack(side="left", fill="both", expand=True)
     scroll.pack(side="right", fill="y")
 
-    files = [f for f in os.listdir(".") if f.endswith(".txt")]
-    if files:
-        for fn in sorted(files):
-            nm, th, cl, opn = "Unknown", 0.25, 0.20, 0.40
-            try:
-                with open(fn, "r") as f:
-                    lines = f.readlines()
-                    nm = lines[0].split(":")[1].strip()
-                    opn = float(lines[1].split(":")[1].strip())  # OpenEye
-                    cl = float(lines[2].split(":")[1].strip())  # ClosedEye
-                    th = float(lines[3].split(":")[1].strip())  # Threshold
-
-            except:
-                continue
+    try:
+        profiles = store.drivers()
+    except Exception as e:
+        print("Driver list failed:", e)
+        profiles = []
+    if profiles:
+        for nm, opn, cl, th, src in profiles:
+            if src not in RATIO_SOURCES:
+                continue  # Calibrated with a ratio this build does not know
             c = tk.Frame(content, bg="white", pady=15, padx=15)
             c.pack(pady=5, fill="x")
             tk.Label(c, text=nm, font=("Helvetica", 14, "bold"), bg="white").pack(side="left")
             tk.Button(c, text="SELECT", bg=THEME["primary"], fg="white", font=("Arial", 10, "bold"), relief="flat",
-                      command=lambda n=nm, t=th, c=cl, o=opn: set_state("operation",
-                                                                        driver=n,
-                                                                        threshold=t,
-                                                                        closed_eye=c,
-                                                                        open_eye=o)).pack(side="right")
+                      command=lambda n=nm, t=th, c=cl, o=opn, s=src: set_state("operation",
+                                                                               driver=n,
+                                                                               threshold=t,
+                                                                               closed_eye=c,
+                                                                               open_eye=o,
+                                                                               ratio_source=s)).pack(side="right")
     tk.Button(root, text="REGISTER NEW DRIVER", bg="white", fg=THEME["primary"], font=("Arial", 11, "bold"), padx=20,
               pady=10, relief="flat", command=lambda: set_state("face_registration")).pack(side="bottom", pady=30)
 
@@ -419,6 +415,7 @@ def build_face_registration_screen():
     v_box.pack(pady=10)
     v_lbl = tk.Label(v_box, bg="black")
     v_lbl.pack()
+    renderer = VideoRenderer(v_lbl)
     lbl_ratio = tk.Label(content, text="Ratio: 0.00", font=("Courier", 16, "bold"), bg=THEME["bg"])
     lbl_ratio.pack()
     entry = tk.Entry(content, font=("Helvetica", 16), justify="center")
@@ -429,33 +426,45 @@ def build_face_registration_screen():
                          pady=10)
     btn_next.pack(side="right", padx=40)
 
-    data = {"step": 1, "open": 0, "closed": 0, "current": 0}
+    data = {"step": 1, "open": 0, "closed": 0, "current": 0, "seq": 0, "source": RATIO_SOURCE}
+
+    # Ratio source toggle, only while measuring the open eye (both values must use the same source)
+    def toggle_source():
+        names = list(RATIO_SOURCES)
+        data["source"] = names[(names.index(data["source"]) + 1) % len(names)]
+        btn_source.config(text=f"RATIO: {data['source'].upper()}")
+        smooth_ear.reset()
+
+    btn_source = tk.Button(btn_box, text=f"RATIO: {data['source'].upper()}", bg="white", fg=THEME["primary"],
+                           font=("Arial", 11, "bold"), padx=20, pady=10, relief="flat", command=toggle_source)
+    btn_source.pack(side="left", padx=40)
 
     def update():
         if current_state != "face_registration": return
         if data["step"] <= 2:
-            ret, frame = cap.read()
-            if ret:
+            t = perf.now()
+            data["seq"], frame_ts, frame = camera.latest(data["seq"])
+            t = perf.lap("capture", t)
+            if frame is not None:
                 frame, faces = detector.findFaceMesh(frame, draw=True)
                 if faces:
-                    f = faces[0]
-                    v = detector.findDistance(f[159], f[23])[0]
-                    h = detector.findDistance(f[130], f[243])[0]
-                    r = (v / h) * 100
-                    smooth_ear_buffer.append(r)
-                    data["current"] = sum(smooth_ear_buffer) / len(smooth_ear_buffer)
+                    r = ratio_function(data["source"])(faces[0])
+                    data["current"] = smooth_ear.update(frame_ts, r)
                     lbl_ratio.config(text=f"Eye Ratio: {data['current']:.2f}")
+                t = perf.lap("inference", t)
 
-                rgb = cv2.cvtColor(cv2.resize(frame, (400, 300)), cv2.COLOR_BGR2RGB)
-                img = ImageTk.PhotoImage(image=Image.fromarray(rgb))
-                v_lbl.imgtk = img
-                v_lbl.configure(image=img)
+                renderer.resize(frame, (400, 300))
+                t = perf.lap("resize", t)
+                renderer.show()
+                perf.lap("tk_image", t)
+                perf.maybe_log(PERF_LOG_SECONDS)
         root.after(30, update)
 
     def next_step():
         if data["step"] == 1:
             data["open"] = data["current"]
             data["step"] = 2
+            btn_source.pack_forget()
             lbl_instr.config(text="Step 2/3: Close eyes gently.", fg=THEME["alert"])
         elif data["step"] == 2:
             data["closed"] = data["current"]
@@ -470,9 +479,8 @@ def build_face_registration_screen():
             nm = entry.get().strip()
             if not nm: return
             thr = ((data["open"] - data["closed"]) * 0.35) + data["closed"]
-            with open(f"{nm.replace(' ', '_')}.txt", "w") as f:
-                f.write(
-                    f"Name: {nm}\nOpenEye: {data['open']:.2f}\nClosedEye: {data['closed']:.2f}\nThreshold: {thr:.2f}\n")
+            # A new calibration for an existing name replaces it in the selection list (older ones are kept)
+            store.add_calibration(nm, round(data["open"], 2), round(data["closed"], 2), round(thr, 2), data["source"])
             set_state("driver_selection")
 
     btn_next.config(command=next_step)
@@ -490,6 +498,7 @@ def build_operation_screen():
     left.pack_propagate(False)
     vid_lbl = tk.Label(left, bg="black")
     vid_lbl.pack(fill="both", expand=True)
+    renderer = VideoRenderer(vid_lbl)
 
     # Right Dashboard
     right = tk.Frame(main, bg=THEME["dark_mode"], width=320)
@@ -552,15 +561,9 @@ def build_operation_screen():
     # Graph
     g_frame = tk.Frame(right, bg=THEME["dark_mode"], height=150)
     g_frame.pack(fill="x", pady=10)
-    fig, ax = plt.subplots(figsize=(3, 1.5), dpi=100)
-    fig.patch.set_facecolor(THEME["dark_mode"])
-    ax.set_facecolor(THEME["dark_mode"])
-    line, = ax.plot([], [], color=THEME["primary"], linewidth=2)
-    ax.set_ylim(10, 60)
-    ax.set_xlim(0, 50)
-    ax.axis('off')
-    canvas_plot = FigureCanvasTkAgg(fig, master=g_frame)
-    canvas_plot.get_tk_widget().pack(fill="both", expand=True)
+    graph = Sparkline(g_frame, maxlen=ratio_history.maxlen, ymin=10, ymax=60, color=THEME["primary"],
+                      bg=THEME["dark_mode"])
+    graph.pack(fill="both", expand=True)
 
     # --- TELEMETRY PANEL ---
     stats = tk.Frame(right, bg="#353b48", padx=10, pady=6)
@@ -574,32 +577,69 @@ def build_operation_screen():
                           bg="#353b48", fg="white")
     lbl_droops.pack(anchor="w")
 
+    lbl_perclos = tk.Label(stats, text="PERCLOS (1 MIN): 0%", font=("Arial", 10, "bold"),
+                           bg="#353b48", fg="white")
+    lbl_perclos.pack(anchor="w")
+
     lbl_eye_state = tk.Label(stats, text="EYE STATE: OPEN", font=("Arial", 10, "bold"),
                              bg="#353b48", fg=THEME["success"])
     lbl_eye_state.pack(anchor="w")
 
 
+    # --- PERF OVERLAY (toggled with the PERF button) ---
+    lbl_perf = tk.Label(right, text="", font=("Courier", 8), justify="left", anchor="w",
+                        bg="#353b48", fg="#b2bec3", padx=10, pady=4)
+    perf_view = {"shown": False, "last": 0}
+
+    def toggle_perf():
+        perf_view["shown"] = not perf_view["shown"]
+        if perf_view["shown"]:
+            lbl_perf.pack(fill="x", after=stats)
+        else:
+            lbl_perf.pack_forget()
+
+    tk.Button(driver_bar, text="PERF", font=("Arial", 9, "bold"), bg="#2d3436", fg="white", relief="flat",
+              padx=8, command=toggle_perf).pack(side="left", padx=4)
+
+    def update_perf_overlay():
+        now = time.monotonic()
+        if now - perf_view["last"] < 1.0:
+            return
+        perf_view["last"] = now
+        perf.counters["cam_drop"] = camera.frames_dropped
+        if governor:
+            perf.counters["cam_skip"] = camera.frames_skipped
+            perf.counters["governor"] = f"{governor.mode} {governor.fps or 'max'}"
+        perf.counters["ui_skip"] = ui.suppressed
+        if perf_view["shown"]:
+            lbl_perf.config(text="stage      p50    p99\n" + "\n".join(perf.report_lines()))
+        perf.maybe_log(PERF_LOG_SECONDS)
+
     lbl_sys_status = tk.Label(right, text="SYSTEM PAUSED", font=("Arial", 14, "bold"), bg=THEME["dark_mode"], fg="grey")
     lbl_sys_status.pack(side="bottom", pady=20)
     tk.Button(right, text="EXIT", bg="#636e72", fg="white", relief="flat",
               command=lambda: set_state("driver_selection")).pack(side="bottom")
 
     # --- OPERATION VARS ---
-    WARNING_COOLDOWN = 8
+    ui = UiBindings()
+    engine = DrowsinessEngine(driver_threshold, driver_closed_eye, driver_open_eye)
+    ratio = ratio_function(driver_ratio_source)
+    ratio_ids = RATIO_SOURCES[driver_ratio_source]
+    if tracker:
+        # Track what the profile's ratio needs, plus the lid/width points the drift checks use
+        tracker.set_ids(tuple(dict.fromkeys(EYE_LANDMARKS + ratio_ids)))
     op = {
-        "status": "NORMAL",
-        "blink_start": None,
-        "blink_count": 0,
-        "last_blink": 0,
-        "meas": [],
-        "warn_start": 0,
-        "last_warning": 0,
-        "blink_times": deque(),
-        "droop_events": deque(),
-        "droop_start": None,
-        "droop_segments": 0,
-        "alarm_reason": None,
-
+        "frame_seq": 0,
+        "frame": None,
+        "face": None,
+        "last_loop": 0,
+        "v_state": "STATIONARY",
+        "v_speed": 0,
+        "sample": 0,  # Engine updates so far
+        "graph_ts": 0.0,  # Capture time of the last graph point
+        # What the screen currently shows, so paint() can skip unchanged parts
+        "painted_frame": None,
+        "painted_sample": 0,
     }
 
     # These must be defined before use
@@ -614,32 +654,16 @@ def build_operation_screen():
             overlay.destroy()
             overlay = None
 
-        # Reset state
-        op["status"] = "NORMAL"
-        op["blink_start"] = None
-        op["blink_count"] = 0
-        op["last_blink"] = 0
-        op["meas"] = []
-        op["warn_start"] = 0
-        op["last_warning"] = time.time()  # restart cooldown
-
-        # Clear rolling windows
-        op["blink_times"].clear()
-        op["droop_events"].clear()
-        op["droop_start"] = None
-        op["droop_segments"] = 0
-
-        # Clear smoothing buffers (VERY IMPORTANT)
-        smooth_ear_buffer.clear()
+        # Reset rules, rolling windows and smoothing; restarts the warning cooldown
+        engine.acknowledge(time.monotonic())
         ratio_history.clear()
 
         # Turn off vibration motor
         if GPIO_AVAILABLE and Motors:
             Motors.off()
 
-    def trigger_alarm():
-        log_alarm_event(op.get("alarm_reason", "UNKNOWN"))
-        op["status"] = "ALARM"
+    def trigger_alarm(reason):
+        log_alarm_event(reason or "UNKNOWN")
         start_alarm_sound()
         if GPIO_AVAILABLE:
             try:
@@ -656,164 +680,100 @@ def build_operation_screen():
             tk.Label(overlay, text="DANGER", font=("Arial", 30, "bold"), bg=THEME["alert"], fg="white").pack(pady=30)
             tk.Button(overlay, text="STOP ALARM", bg="white", fg="red", font=("Arial", 16), command=reset).pack()
 
-    def show_warning(msg):
-
+    def show_warning(msg, countdown):
         nonlocal overlay, count_lbl
-        now = time.time()
-
-        # Cooldown Check
-        if (now - op["last_warning"]) < WARNING_COOLDOWN:
-            return
-
-        # Don't overwrite existing warning
-        if op["status"] != "NORMAL":
-            return
-
         start_alarm_sound()
 
-        op["status"] = "PRE_WARNING"
-        op["warn_start"] = time.time()
-        op["last_warning"] = now
-
         overlay = tk.Frame(left, bg=THEME["warning"])
         overlay.place(relx=0.5, rely=0.5, anchor="center", relwidth=0.8, relheight=0.6)
 
         tk.Label(overlay, text="⚠️ ARE YOU AWAKE?", font=("Arial", 22, "bold"), bg=THEME["warning"]).pack(pady=20)
         tk.Label(overlay, text=msg, font=("Arial", 14), bg=THEME["warning"]).pack()
 
-        count_lbl = tk.Label(overlay, text="3", font=("Arial", 60, "bold"), bg=THEME["warning"], fg="red")
+        count_lbl = tk.Label(overlay, text=str(countdown), font=("Arial", 60, "bold"), bg=THEME["warning"], fg="red")
         count_lbl.pack()
 
         tk.Button(overlay, text="YES", bg="white", font=("Arial", 14), command=reset).pack(pady=10)
 
-    def loop():
+    def on_engine_event(ev):
+        if ev.kind == "WARNING":
+            show_warning(ev.reason, ev.value)
+        elif ev.kind == "COUNTDOWN":
+            if count_lbl: count_lbl.config(text=str(ev.value))
+        elif ev.kind == "ALARM":
+            trigger_alarm(ev.reason)
+
+    engine.subscribe(on_engine_event)
+    if SESSION_DIR:
+        start_session_recording(engine)
+
+    graph.set_threshold("closed", driver_threshold, color=THEME["alert"])
+    graph.set_threshold("droop", engine.droop_threshold, color=THEME["warning"])
+
+    def detect():
+        """Safety path: every new camera frame goes through inference and the rules."""
         if current_state != "operation": return
         try:
-            ret, frame = cap.read()
-            if ret:
-                w, h = left.winfo_width(), left.winfo_height()
-                if w > 10 and h > 10:
-                    frame, faces = detector.findFaceMesh(frame, draw=True)
-                    frame_resized = cv2.resize(frame, (w, h))
-
-                    # --- VEHICLE DYNAMICS ---
-                    v_state, v_speed = mpu.get_vehicle_status()
-                    lbl_veh_status.config(text=v_state)
-                    lbl_speed.config(text=f"{int(v_speed)} KPH")
-
-                    check_drowsy = False
-                    if v_state == "STATIONARY":
-                        lbl_veh_status.config(fg="white")
-                        lbl_sys_status.config(text="SYSTEM PAUSED", fg="grey")
-                    elif "TURNING" in v_state:
-                        lbl_veh_status.config(fg=THEME["warning"])
-                        lbl_sys_status.config(text=f"{v_state} (PAUSED)", fg=THEME["warning"])
+            t = perf.now()
+            seq, frame_ts, frame = camera.latest(op["frame_seq"])
+            if frame is not None:
+                if op["last_loop"]:
+                    perf.record("period", t - op["last_loop"])
+                op["last_loop"] = t
+                op["frame_seq"] = seq
+                t = perf.lap("capture", t)
+
+                # Frame the landmarks belong to: its capture time drives the rules
+                sample_seq, sample_ts = seq, frame_ts
+                if inference and not inference.crashed():
+                    # Worker process does the face mesh on the shared ring slot;
+                    # rules only run on fresh results, timed by the frame they came from
+                    inference.submit(camera.ring, seq, frame_ts)
+                    result = inference.poll()
+                    faces = result[2] if result else []
+                    fresh = result is not None
+                    if result:
+                        sample_seq, sample_ts = result[0], result[1]
+                        op["face"] = faces[0] if faces else None
+                else:
+                    fresh = True
+                    if tracker:
+                        faces = tracker.process(frame)
                     else:
-                        lbl_veh_status.config(fg=THEME["success"])
-                        lbl_sys_status.config(text="SYSTEM ACTIVE", fg=THEME["success"])
-                        check_drowsy = True
-
-                    # --- MAIN DROWSINESS LOGIC ---
-                    if faces:
-                        f = faces[0]
-                        v = detector.findDistance(f[159], f[23])[0]
-                        h = detector.findDistance(f[130], f[243])[0]
-                        raw = (v / h) * 100
-                        smooth_ear_buffer.append(raw)
-                        ear = sum(smooth_ear_buffer) / len(smooth_ear_buffer)
-                        lbl_ear.config(text=f"{ear:.2f}")
-
-                        ratio_history.append(ear)
-                        line.set_data(range(len(ratio_history)), list(ratio_history))
-                        canvas_plot.draw_idle()
-
-                        now = time.time()
-
-                        # Disable driver change during alerts
-                        if op["status"] in ("PRE_WARNING", "ALARM"):
-                            btn_change_driver.config(state="disabled")
-                        else:
-                            btn_change_driver.config(state="normal")
-
-                        # Droop Threshold Calculation
-                        droop_threshold = driver_closed_eye + (driver_open_eye - driver_closed_eye) * 0.7
-
-                        if op["status"] == "NORMAL" and check_drowsy:
-                            is_open = raw > driver_threshold
-                            is_drooping = ear < droop_threshold
-
-                            # --- Rule 1: Eyes Closed ---
-                            if not is_open:
-                                if op["blink_start"] is None:
-                                    op["blink_start"] = now
-                                elif now - op["blink_start"] > 1.2:
-                                    op["alarm_reason"] = "EYES CLOSED"
-                                    show_warning("EYES CLOSED")
-                            else:
-                                if op["blink_start"]:
-                                    op["blink_start"] = None
-
-                                    # 500ms blink cooldown
-                                    if now - op["last_blink"] >= 0.5:
-                                        op["blink_times"].append(now)
-                                        op["last_blink"] = now
-
-                                    while op["blink_times"] and (now - op["blink_times"][0] > 60):
-                                        op["blink_times"].popleft()
-
-                                    if len(op["blink_times"]) >= 30:  # Strict limit
-                                        op["alarm_reason"] = "FREQUENT BLINKING"
-                                        show_warning("FREQUENT BLINKING")
-
-                            # --- Rule 2: Drooping Eyelids ---
-                            if is_drooping:
-                                if op["droop_start"] is None:
-                                    op["droop_start"] = now
-                                    op["droop_segments"] = 0
-                                else:
-                                    elapsed = now - op["droop_start"]
-                                    segments = int(elapsed // 2)
-
-                                    if segments > op["droop_segments"]:
-                                        new_events = segments - op["droop_segments"]
-                                        for _ in range(new_events):
-                                            op["droop_events"].append(now)
-                                        op["droop_segments"] = segments
-
-                                        # Rolling Droop Counter
-                                        while op["droop_events"] and (now - op["droop_events"][0] > 60):
-                                            op["droop_events"].popleft()
-
-                                        if len(op["droop_events"]) >= 6:
-                                            op["alarm_reason"] = "DROPPING EYELIDS"
-                                            show_warning("DROPPING EYELIDS")
-                            else:
-                                op["droop_start"] = None
-                                op["droop_segments"] = 0
-
-                            # --- TELEMETRY UPDATE ---
-                            lbl_blinks.config(text=f"BLINKS (1 MIN): {len(op['blink_times'])}")
-                            lbl_droops.config(text=f"DROOPS (1 MIN): {len(op['droop_events'])}")
-
-                            if is_drooping:
-                                lbl_eye_state.config(text="EYE STATE: DROOPING", fg=THEME["warning"])
-                            else:
-                                lbl_eye_state.config(text="EYE STATE: OPEN", fg=THEME["success"])
-
-
-                        elif op["status"] == "PRE_WARNING":
-                            elapsed = int(time.time()- op["warn_start"])
-                            rem = 3 - elapsed
-
-                            if rem > 0:
-                                if count_lbl: count_lbl.config(text=str(rem))
-                            else:
-                                trigger_alarm()
-
-                    rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-                    img = ImageTk.PhotoImage(image=Image.fromarray(rgb))
-                    vid_lbl.imgtk = img
-                    vid_lbl.configure(image=img)
+                        frame, faces = detector.findFaceMesh(frame, draw=False)
+                    op["face"] = faces[0] if faces else None
+                op["frame"] = frame  # Stays pinned until the next camera.latest()
+                t = perf.lap("inference", t)
+
+                # --- VEHICLE DYNAMICS ---
+                op["v_state"], op["v_speed"] = mpu.get_vehicle_status()
+                t = perf.lap("vehicle", t)
+
+                # --- MAIN DROWSINESS LOGIC ---
+                raw = None
+                if faces:
+                    # Rules run in the engine; the UI reacts to its events
+                    raw = ratio(faces[0])
+                    engine.update(sample_ts, raw, op["v_state"])
+                    if sample_ts - op["graph_ts"] >= GRAPH_SAMPLE_SECONDS:
+                        op["graph_ts"] = sample_ts
+                        ratio_history.append(engine.ear)
+                    op["sample"] += 1
+                    t = perf.lap("rules", t)
+
+                if recorder and fresh:
+                    # Video only when the newest frame is the one the landmarks came from
+                    recorder.record(sample_ts, sample_seq, faces[0] if faces else None, raw, engine.ear,
+                                    op["v_state"], op["v_speed"], engine.status,
+                                    frame if sample_seq == seq else None)
+                    perf.lap("record", t)
+
+                if governor:
+                    camera.min_interval = governor.update(op["v_state"], engine.ear if faces else None,
+                                                          driver_threshold, frame_ts)
+
+                if not UI_FPS:
+                    paint()
 
         except Exception as e:
             print(e)
@@ -821,18 +781,123 @@ def build_operation_screen():
 
         update_alarm_sound()
 
-        root.after(20, loop)
+        root.after(DETECT_POLL_MS, detect)
+
+    def paint():
+        """Repaints the video and dashboard from the latest detection results, skipping unchanged parts."""
+        t = perf.now()
+        w, h = left.winfo_width(), left.winfo_height()
+        frame = op["frame"]
+        if frame is not None and w > 10 and h > 10 and (op["frame_seq"], w, h) != op["painted_frame"]:
+            op["painted_frame"] = (op["frame_seq"], w, h)
+            frame_resized = renderer.resize(frame, (w, h))
+            # Landmarks go on the resized copy: the ring slot may still be read by the worker
+            draw_eye_landmarks(frame_resized, op["face"], w / frame.shape[1], h / frame.shape[0], ratio_ids)
+            t = perf.lap("resize", t)
+            renderer.show()
+            t = perf.lap("tk_image", t)
+
+        # --- DASHBOARD (ui.set only reconfigures widgets whose values changed) ---
+        v_state = op["v_state"]
+        ui.set(lbl_speed, text=f"{int(op['v_speed'])} KPH")
+        if v_state == "STATIONARY":
+            ui.set(lbl_veh_status, text=v_state, fg="white")
+            ui.set(lbl_sys_status, text="SYSTEM PAUSED", fg="grey")
+        elif "TURNING" in v_state:
+            ui.set(lbl_veh_status, text=v_state, fg=THEME["warning"])
+            ui.set(lbl_sys_status, text=f"{v_state} (PAUSED)", fg=THEME["warning"])
+        else:
+            ui.set(lbl_veh_status, text=v_state, fg=THEME["success"])
+            ui.set(lbl_sys_status, text="SYSTEM ACTIVE", fg=THEME["success"])
+
+        # Disable driver change during alerts
+        ui.set(btn_change_driver, state="disabled" if engine.status in (PRE_WARNING, ALARM) else "normal")
+
+        new_sample = op["sample"] != op["painted_sample"]
+        op["painted_sample"] = op["sample"]
+        if new_sample:
+            ui.set(lbl_ear, text=f"{engine.ear:.2f}")
+
+            # --- TELEMETRY UPDATE ---
+            if engine.active:
+                ui.set(lbl_blinks, text=f"BLINKS (1 MIN): {engine.blink_count()}")
+                ui.set(lbl_droops, text=f"DROOPS (1 MIN): {engine.droop_count()}")
+                perclos = engine.perclos()
+                ui.set(lbl_perclos, text=f"PERCLOS (1 MIN): {perclos * 100:.0f}%",
+                       fg=THEME["warning"] if perclos >= PERCLOS_LIMIT else "white")
+
+                if engine.is_drooping:
+                    ui.set(lbl_eye_state, text="EYE STATE: DROOPING", fg=THEME["warning"])
+                else:
+                    ui.set(lbl_eye_state, text="EYE STATE: OPEN", fg=THEME["success"])
+        t = perf.lap("labels", t)
 
+        if new_sample:
+            graph.set_data(ratio_history)
+            perf.lap("plot", t)
 
+        update_perf_overlay()
+
+    def paint_tick():
+        if current_state != "operation": return
+        try:
+            paint()
+        except Exception as e:
+            print(e)
+        root.after(int(1000 / UI_FPS), paint_tick)
+
+    # Start the loops
+    detect()
+    if UI_FPS:
+        paint_tick()
 
-    # Start the loop
-    loop()
 
+if __name__ == "__main__":
+    # --- HARDWARE CHECK ---
+    pygame.mixer.init()
+    pygame.mixer.music.load("alarm.wav")
+    pygame.mixer.music.set_volume(1.0)
 
-root = tk.Tk()
-root.title("DrowsyCam Professional")
-root.geometry("1024x600")
-root.protocol("WM_DELETE_WINDOW", on_close)
-root.bind("<Escape>", lambda e: root.attributes("-fullscreen", False))
-set_state("start")
-root.mainloop()
\ No newline at end of file
+    try:
+        from gpiozero import OutputDevice
+
+        test_led = OutputDevice(17, active_high=True)
+        test_led.close()
+        GPIO_AVAILABLE = True
+
+    except Exception as e:
+        print("GPIO INIT FAILED:", e)
+
+    cap = cv2.VideoCapture(0)
+    camera = CameraStream(cap)
+    camera.start()
+    detector = FaceMeshDetector(maxFaces=1)
+    # Sampled on its own thread; mpu.get_vehicle_status() returns the newest state
+    mpu_bus = None
+    if IMU_TRACE_PATH:
+        try:
+            imu_trace = TraceWriter(IMU_TRACE_PATH)
+            mpu_bus = RecordingBus(open_bus(), imu_trace)
+        except Exception as e:
+            print("IMU TRACE DISABLED:", e)
+    mpu = ImuSampler(MPU_Sensor(bus=mpu_bus))
+    mpu.start()
+    if USE_INFERENCE_PROCESS:
+        inference = InferencePipeline(max_faces=1)
+    if USE_EYE_TRACKING:
+        tracker = EyeTracker(detector, EYE_LANDMARKS, refresh_every=TRACK_REFRESH_FRAMES)
+    if USE_FRAME_GOVERNOR:
+        governor = FrameGovernor()
+    store = DriverStore(DB_PATH)
+    imported = store.import_profiles(".")
+    if imported:
+        print(f"Imported {imported} driver profiles into {DB_PATH}")
+    event_log = EventLog(store=store)
+
+    root = tk.Tk()
+    root.title("DrowsyCam Professional")
+    root.geometry("1024x600")
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.bind("<Escape>", lambda e: root.attributes("-fullscreen", False))
+    set_state("start")
+    root.mainloop()
\ No newline at end of file
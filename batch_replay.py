@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from eye_metrics import DEFAULT_RATIO_SOURCE, RATIO_SOURCES
+from replay import find_videos, read_profile, read_ratio_source, replay_video
+
+# One detector per worker process, created once by the pool initializer
+_detector = None
+
+
+def _init_worker():
+    global _detector
+    from cvzone.FaceMeshModule import FaceMeshDetector
+    _detector = FaceMeshDetector(maxFaces=1)
+
+
+def _process_clip(path, profile, vehicle_state, ratio_source):
+    try:
+        return replay_video(path, _detector, profile, vehicle_state, ratio_source=ratio_source)
+    except Exception as e:
+        return {"file": path, "error": str(e)}
+
+
+def settings_key(profile, vehicle_state, ratio_source):
+    """Short hash of everything besides the clip that changes its result, stored with each record."""
+    settings = json.dumps([list(profile), vehicle_state, ratio_source])
+    return hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+
+def load_done(results_path, settings):
+    """ Returns: {file: summary} for clips already in the results file with these settings """
+    done = {}
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, "r") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from an interrupted run
+            if "error" in rec or rec.get("settings") != settings:
+                continue  # Failed, or run with another profile / ratio source (or by an older version)
+            done[rec["file"]] = rec
+    return done
+
+
+def aggregate(summaries):
+    totals = {"clips": 0, "frames": 0, "faces": 0, "video_seconds": 0.0, "warnings": 0, "alarms": 0,
+              "blinks": 0, "observed_seconds": 0.0, "closed_seconds": 0.0, "alarm_reasons": {}}
+    for s in summaries:
+        totals["clips"] += 1
+        for k in ("frames", "faces", "video_seconds", "warnings", "alarms", "blinks", "observed_seconds",
+                  "closed_seconds"):
+            totals[k] += s.get(k, 0)
+        for reason, n in s.get("alarm_reasons", {}).items():
+            totals["alarm_reasons"][reason] = totals["alarm_reasons"].get(reason, 0) + n
+
+    minutes = totals["video_seconds"] / 60
+    totals["blinks_per_min"] = totals["blinks"] / minutes if minutes else 0.0
+    totals["perclos"] = totals["closed_seconds"] / totals["observed_seconds"] if totals["observed_seconds"] else 0.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay many clips in parallel and build one report.")
+    parser.add_argument("inputs", nargs="+", help="video files and/or directories")
+    parser.add_argument("-r", "--results", default="batch_results.jsonl",
+                        help="per-clip results, appended as clips finish; clips already in it with the same "
+                             "profile, vehicle state and ratio source are skipped")
+    parser.add_argument("-o", "--report", default="batch_report.json")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--profile", help="driver profile .txt to take thresholds from")
+    parser.add_argument("--threshold", type=float, default=30.0)
+    parser.add_argument("--closed-eye", type=float, default=20.0)
+    parser.add_argument("--open-eye", type=float, default=40.0)
+    parser.add_argument("--vehicle-state", default="DRIVING")
+    parser.add_argument("--ratio-source", choices=sorted(RATIO_SOURCES),
+                        help="eye ratio to compute (default: the profile's, else lid)")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        profile = read_profile(args.profile)
+    else:
+        profile = (args.threshold, args.closed_eye, args.open_eye)
+    ratio_source = args.ratio_source or (read_ratio_source(args.profile) if args.profile else DEFAULT_RATIO_SOURCE)
+
+    settings = settings_key(profile, args.vehicle_state, ratio_source)
+    videos = find_videos(args.inputs)
+    done = load_done(args.results, settings)
+    todo = [v for v in videos if v not in done]
+    print(f"{len(videos)} clips, {len(done)} already done, {len(todo)} to process", file=sys.stderr)
+
+    started = time.perf_counter()
+    frames = 0
+    with open(args.results, "a") as results, \
+            ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) as pool:
+        futures = [pool.submit(_process_clip, v, profile, args.vehicle_state, ratio_source) for v in todo]
+        for i, fut in enumerate(as_completed(futures), 1):
+            s = fut.result()
+            s["settings"] = settings
+            # One line per finished clip, flushed immediately so an interrupted run resumes from here
+            results.write(json.dumps(s) + "\n")
+            results.flush()
+            if "error" in s:
+                print(f"[{i}/{len(todo)}] {s['file']}: {s['error']}", file=sys.stderr)
+                continue
+            done[s["file"]] = s
+            frames += s["frames"]
+            print(f"[{i}/{len(todo)}] {s['file']}: {s['fps']:.1f} fps, alarms {s['alarms']}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    report = {"settings": {"key": settings, "profile": list(profile), "vehicle_state": args.vehicle_state,
+                           "ratio_source": ratio_source},
+              "totals": aggregate(done.values()), "clips": sorted(done.values(), key=lambda s: s["file"])}
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if elapsed > 0 and frames:
+        print(f"Processed {frames} frames in {elapsed:.1f}s = {frames / elapsed:.1f} fps", file=sys.stderr)
+    print(f"Report written to {args.report}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from drowsiness_engine import DrowsinessEngine
+from eye_metrics import EAR_LANDMARKS, EYE_LANDMARKS, eye_aspect_ratio, eye_aspect_ratios, eye_ratio, landmark_points
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LANDMARK_FIXTURE = os.path.join(FIXTURE_DIR, "eye_landmarks.json")
+# 2 s of a face filling the frame the way a driver does, panning slowly (license: driver_face.license.terms)
+FACE_CLIP = os.path.join(FIXTURE_DIR, "driver_face.mp4")
+DISPLAY_SIZE = (684, 556)  # Video panel of the 1024x600 operation screen
+# Stages the live loop runs per frame; the others are breakdowns or the old implementations
+TOTAL_STAGES = ("face_mesh", "ear", "rules", "render", "sparkline")
+
+
+# --- FIXTURES ---
+def load_landmarks(path=LANDMARK_FIXTURE):
+    """ Returns: fps, list of {id: [x, y]} faces """
+    with open(path, "r") as f:
+        data = json.load(f)
+    ids = data["ids"]
+    faces = []
+    for flat in data["frames"]:
+        faces.append({i: [flat[2 * k], flat[2 * k + 1]] for k, i in enumerate(ids)})
+    return data["fps"], faces
+
+
+def load_frames(video=FACE_CLIP, count=60):
+    """Frames from a clip (the checked-in face clip by default), else deterministic synthetic frames."""
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    if not frames:
+        rng = np.random.default_rng(0)
+        base = cv2.GaussianBlur((rng.random((480, 640, 3)) * 255).astype(np.uint8), (9, 9), 3)
+        frames = [np.roll(base, i * 2, axis=1) for i in range(count)]
+        video = "synthetic"
+    return video, frames
+
+
+# --- TIMING ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def time_stage(fn, items, repeat=1):
+    """Times fn(item) for every item. Returns: per-call durations in seconds."""
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            t0 = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def summarize(samples):
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "mean_ms": 1000 * sum(s) / len(s),
+        "p50_ms": 1000 * percentile(s, 50),
+        "p99_ms": 1000 * percentile(s, 99),
+    }
+
+
+# --- STAGES ---
+def bench_face_mesh(frames, meta):
+    """Also counts the frames with a face into meta["faces_found"]: without one, face mesh
+    only runs its cheap detector pass and the timing says nothing about the live hot path."""
+    try:
+        from cvzone.FaceMeshModule import FaceMeshDetector
+    except ImportError:
+        return None, "cvzone not installed"
+    detector = FaceMeshDetector(maxFaces=1)
+    detector.findFaceMesh(frames[0].copy(), draw=False)  # Warm-up
+    found = [0]
+
+    def run(f):
+        _, faces = detector.findFaceMesh(f, draw=False)
+        found[0] += bool(faces)
+
+    samples = time_stage(run, frames)
+    meta["faces_found"] = found[0]
+    return samples, None
+
+
+def bench_tracker(frames):
+    """Face mesh every few frames, optical flow on the eyes in between (DROWSYCAM_EYE_TRACKING=1)."""
+    try:
+        from cvzone.FaceMeshModule import FaceMeshDetector
+    except ImportError:
+        return None, "cvzone not installed"
+    from eye_tracker import EyeTracker
+    tracker = EyeTracker(FaceMeshDetector(maxFaces=1), EYE_LANDMARKS)
+    tracker.process(frames[0].copy())  # Warm-up
+    return time_stage(tracker.process, frames), None
+
+
+def bench_ear(faces):
+    return time_stage(eye_ratio, faces, repeat=5), None
+
+
+def bench_ear_multi(faces):
+    return time_stage(eye_aspect_ratio, faces, repeat=5), None
+
+
+def bench_ear_batch(faces):
+    """Per-frame cost of the vectorised EAR over the whole fixture at once (replay path)."""
+    points = landmark_points(faces, EAR_LANDMARKS)
+    return [s / len(faces) for s in time_stage(eye_aspect_ratios, [points], repeat=50)], None
+
+
+def bench_rules(fps, faces):
+    ratios = [eye_ratio(f) for f in faces]
+    samples = []
+    for _ in range(5):
+        engine = DrowsinessEngine(threshold=25.0, closed_eye=10.0, open_eye=35.0)
+        for i, r in enumerate(ratios):
+            t0 = time.perf_counter()
+            events = engine.update(i / fps, r, "DRIVING")
+            samples.append(time.perf_counter() - t0)
+            if any(ev.kind == "ALARM" for ev in events):
+                engine.acknowledge(i / fps)
+    return samples, None
+
+
+def bench_resize(frames):
+    return time_stage(lambda f: cv2.resize(f, DISPLAY_SIZE), frames, repeat=3), None
+
+
+def bench_cvtcolor(frames):
+    resized = [cv2.resize(f, DISPLAY_SIZE) for f in frames]
+    return time_stage(lambda f: cv2.cvtColor(f, cv2.COLOR_BGR2RGB), resized, repeat=3), None
+
+
+def bench_photoimage(frames, tk_root):
+    if tk_root is None:
+        return None, "no Tk display"
+    from PIL import Image, ImageTk
+    rgb = [cv2.cvtColor(cv2.resize(f, DISPLAY_SIZE), cv2.COLOR_BGR2RGB) for f in frames]
+    import tkinter as tk
+    lbl = tk.Label(tk_root)
+
+    def show(a):
+        img = ImageTk.PhotoImage(image=Image.fromarray(a))
+        lbl.imgtk = img
+        lbl.configure(image=img)
+
+    return time_stage(show, rgb, repeat=3), None
+
+
+def bench_render(frames, tk_root):
+    if tk_root is None:
+        return None, "no Tk display"
+    import tkinter as tk
+    from video_renderer import VideoRenderer
+    renderer = VideoRenderer(tk.Label(tk_root))
+    return time_stage(lambda f: renderer.render(f, DISPLAY_SIZE), frames, repeat=3), None
+
+
+def bench_plot(faces):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return None, "matplotlib not installed"
+    from collections import deque
+    fig, ax = plt.subplots(figsize=(3, 1.5), dpi=100)
+    line, = ax.plot([], [], linewidth=2)
+    ax.set_ylim(10, 60)
+    ax.set_xlim(0, 50)
+    ax.axis('off')
+    history = deque(maxlen=50)
+    ratios = [eye_ratio(f) for f in faces[:300]]
+
+    def draw(r):
+        history.append(r)
+        line.set_data(range(len(history)), list(history))
+        fig.canvas.draw()  # What draw_idle ends up doing on the next Tk idle
+
+    return time_stage(draw, ratios), None
+
+
+def bench_sparkline(faces, tk_root):
+    if tk_root is None:
+        return None, "no Tk display"
+    from collections import deque
+    from sparkline import Sparkline
+    graph = Sparkline(tk_root, maxlen=50, ymin=10, ymax=60)
+    graph.pack()
+    history = deque(maxlen=50)
+    ratios = [eye_ratio(f) for f in faces[:300]]
+
+    def draw(r):
+        history.append(r)
+        graph.set_data(history)
+        tk_root.update_idletasks()  # Include the Tk redraw it triggers
+
+    return time_stage(draw, ratios), None
+
+
+def open_tk():
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+        return root
+    except Exception:
+        return None
+
+
+# --- REPORT ---
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(
+            os.path.abspath(__file__)), stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline):
+    for name, r in (("baseline", baseline), ("this run", report)):
+        if r.get("total", {}).get("representative") is False:
+            print(f"WARNING: {name}'s TOTAL has no face_mesh stage (or it saw no face) - not comparable")
+    print(f"\n{'stage':<14}{'base p50':>10}{'now p50':>10}{'change':>9}")
+    for name, cur in report["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        change = (cur["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        print(f"{name:<14}{old['p50_ms']:>10.3f}{cur['p50_ms']:>10.3f}{change:>+8.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of the per-frame hot path.")
+    parser.add_argument("--video", default=FACE_CLIP, help="clip with a face to take frames from")
+    parser.add_argument("--frames", type=int, default=60, help="video frames per image stage")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    parser.add_argument("--skip", nargs="*", default=[], help="stage names to skip")
+    args = parser.parse_args(argv)
+
+    fps, faces = load_landmarks()
+    video, frames = load_frames(args.video, args.frames)
+    tk_root = open_tk()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "opencv": cv2.__version__,
+            "video": video,
+            "frame_shape": list(frames[0].shape),
+            "landmark_frames": len(faces),
+            "faces_found": None,  # Frames face_mesh found a face in (set by the face_mesh stage)
+        },
+        "stages": {},
+        "skipped": {},
+    }
+
+    stages = [
+        ("face_mesh", lambda: bench_face_mesh(frames, report["meta"])),
+        ("tracker", lambda: bench_tracker(frames)),
+        ("ear", lambda: bench_ear(faces)),
+        ("ear_multi", lambda: bench_ear_multi(faces)),
+        ("ear_batch", lambda: bench_ear_batch(faces)),
+        ("rules", lambda: bench_rules(fps, faces)),
+        ("resize", lambda: bench_resize(frames)),
+        ("cvtcolor", lambda: bench_cvtcolor(frames)),
+        ("photoimage", lambda: bench_photoimage(frames, tk_root)),
+        ("render", lambda: bench_render(frames, tk_root)),
+        ("plot_draw", lambda: bench_plot(faces)),
+        ("sparkline", lambda: bench_sparkline(faces, tk_root)),
+    ]
+
+    print(f"{'stage':<14}{'n':>7}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, run in stages:
+        if name in args.skip:
+            report["skipped"][name] = "skipped by --skip"
+            continue
+        samples, reason = run()
+        if samples is None:
+            report["skipped"][name] = reason
+            print(f"{name:<14}  skipped ({reason})")
+            continue
+        if name == "face_mesh" and not report["meta"]["faces_found"]:
+            # Synthetic frames (or a clip without a face) only exercise the no-face path
+            print(f"FAIL: face mesh found no face in {video}; its timing and the TOTAL would be meaningless")
+            return 1
+        s = summarize(samples)
+        if name == "face_mesh":
+            s["representative"] = True
+        report["stages"][name] = s
+        print(f"{name:<14}{s['n']:>7}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}{s['p99_ms']:>10.3f}")
+
+    total_ms = sum(s["mean_ms"] for name, s in report["stages"].items() if name in TOTAL_STAGES)
+    representative = report["stages"].get("face_mesh", {}).get("representative", False)
+    report["total"] = {"mean_ms": total_ms, "fps": 1000 / total_ms if total_ms else 0.0,
+                       "stages": [name for name in TOTAL_STAGES if name in report["stages"]],
+                       "representative": representative}
+    print(f"\nTOTAL {total_ms:.3f} ms/frame = {report['total']['fps']:.1f} fps "
+          f"({', '.join(report['total']['stages'])})")
+    if not representative:
+        print("TOTAL is NOT REPRESENTATIVE of the live loop: face_mesh was skipped")
+
+    if tk_root is not None:
+        tk_root.destroy()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
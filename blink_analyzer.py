@@ -0,0 +1,76 @@
+from collections import namedtuple
+
+Blink = namedtuple("Blink", ["start", "end", "duration", "min_ratio", "closing_velocity",
+                             "reopening_velocity", "interval"])
+# start/end: interpolated threshold crossings (s), duration (s), min_ratio: lowest ratio seen,
+# closing/reopening_velocity: ratio units per second between the crossing and the minimum
+# (None if the minimum sits on the crossing), interval: since the previous blink's start (s, or None)
+
+
+def _crossing(t0, r0, t1, r1, threshold):
+    """Time at which the line between two samples crosses threshold."""
+    if r0 == r1:
+        return t1
+    k = (r0 - threshold) / (r0 - r1)
+    return t0 + min(max(k, 0.0), 1.0) * (t1 - t0)
+
+
+class BlinkAnalyzer:
+    """Turns a stream of (capture timestamp, eye ratio) samples into Blinks.
+
+    An eye counts as closed while ratio <= threshold. Instead of taking the
+    first closed / first open frame as the blink's edges, the crossing time
+    is interpolated linearly between the two samples either side of the
+    threshold, so durations don't snap to the frame period. Across a gap
+    longer than max_gap (face lost, rules paused) nothing is interpolated
+    and the later sample's time is used.
+
+        blink = analyzer.update(ts, ratio)  # a Blink when the eye reopens, else None
+        analyzer.closed_since               # interpolated start of the current closure
+    """
+
+    def __init__(self, threshold, max_gap=0.5):
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.last_start = None  # Start of the previous blink, for intervals
+        self.reset()
+
+    def reset(self):
+        self.prev = None  # (t, ratio)
+        self.closed_since = None
+        self.min_ratio = None
+        self.min_time = None
+
+    @property
+    def closed(self):
+        return self.closed_since is not None
+
+    def update(self, t, ratio):
+        """ Returns: the finished Blink if this sample reopened the eye, else None """
+        prev = self.prev
+        self.prev = (t, ratio)
+        near = prev is not None and t - prev[0] <= self.max_gap
+
+        if ratio <= self.threshold:
+            if self.closed_since is None:
+                self.closed_since = _crossing(prev[0], prev[1], t, ratio, self.threshold) if near else t
+                self.min_ratio = ratio
+                self.min_time = t
+            elif ratio < self.min_ratio:
+                self.min_ratio = ratio
+                self.min_time = t
+            return None
+
+        if self.closed_since is None:
+            return None
+
+        start = self.closed_since
+        end = _crossing(prev[0], prev[1], t, ratio, self.threshold) if near else t
+        depth = self.threshold - self.min_ratio
+        closing = depth / (self.min_time - start) if self.min_time > start else None
+        reopening = depth / (end - self.min_time) if end > self.min_time else None
+        interval = start - self.last_start if self.last_start is not None else None
+
+        self.last_start = start
+        self.closed_since = None
+        return Blink(start, end, end - start, self.min_ratio, closing, reopening, interval)
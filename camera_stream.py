@@ -0,0 +1,128 @@
+import threading
+import time
+
+import numpy as np
+
+from frame_ring import FrameRing
+
+
+class CameraStream:
+    """Owns a cv2.VideoCapture and reads it on a background thread.
+
+    Frames are decoded straight into the slots of a shared-memory FrameRing
+    (created on the first frame, once the camera resolution is known), so
+    capture allocates nothing per frame and other processes can attach to
+    the same ring. Screens only ever get the newest frame; a frame that gets
+    replaced before anyone picked it up is counted as dropped.
+
+    min_interval (seconds) throttles decoding: frames arriving sooner than
+    that after the last committed one are only grabbed, never retrieved
+    into the ring (see FrameGovernor).
+    """
+
+    def __init__(self, cap, slots=6, readers=2):
+        self.cap = cap
+        self.slots = slots
+        self.readers = readers
+        self.ring = None
+        self.running = False
+        self.thread = None
+        self.consumed_seq = 0
+        self.min_interval = 0.0
+        self.last_commit = 0.0
+
+        # Counters
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.frames_skipped = 0  # Grabbed but not decoded because of min_interval
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=1)
+        self.thread = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def _open_ring(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            return False
+        self.ring = FrameRing.create(frame.shape, frame.dtype, self.slots, self.readers)
+        np.copyto(self.ring.begin_write(), frame)
+        self._commit(time.monotonic())
+        return True
+
+    def _commit(self, now):
+        if self.ring.latest_seq() > self.consumed_seq:
+            self.frames_dropped += 1
+        self.ring.commit(now)
+        self.last_commit = now
+        self.frames_captured += 1
+
+    def _capture_loop(self):
+        while self.running:
+            if self.ring is None:
+                if not self._open_ring():
+                    self.read_failures += 1
+                    time.sleep(0.05)
+                continue
+
+            if self.min_interval > 0 and time.monotonic() - self.last_commit < self.min_interval:
+                # Throttled: keep the driver queue moving without decoding
+                if not self.cap.grab():
+                    self.read_failures += 1
+                    time.sleep(0.05)
+                self.frames_skipped += 1
+                continue
+
+            slot = self.ring.begin_write()
+            if slot is None:
+                # Every slot is pinned by a reader, keep the driver queue moving
+                self.cap.grab()
+                self.frames_dropped += 1
+                continue
+
+            ret, frame = self.cap.read(slot)
+            now = time.monotonic()
+
+            if not ret or frame.shape != slot.shape:
+                self.ring.abort()
+                self.read_failures += 1
+                time.sleep(0.05)  # Camera hiccup, don't spin
+                continue
+
+            if frame is not slot:
+                # Backend did not decode in place
+                np.copyto(slot, frame)
+            self._commit(now)
+
+    def latest(self, after_seq=0, reader=0):
+        """ Returns: seq, timestamp, frame (frame is None if nothing newer than after_seq) """
+        if self.ring is None:
+            return after_seq, None, None
+        seq, ts, frame = self.ring.acquire(reader, after_seq)
+        if frame is not None and seq > self.consumed_seq:
+            self.consumed_seq = seq
+        return seq, ts, frame
+
+    def stats(self):
+        age = None
+        if self.ring is not None and self.ring.latest_seq():
+            age = time.monotonic() - float(self.ring.slot_ts[int(self.ring.head[1])])
+        return {
+            "captured": self.frames_captured,
+            "dropped": self.frames_dropped,
+            "failures": self.read_failures,
+            "skipped": self.frames_skipped,
+            "age": age,
+        }
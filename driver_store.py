@@ -0,0 +1,226 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from eye_metrics import DEFAULT_RATIO_SOURCE
+
+DEFAULT_DB = "drowsycam.db"
+SCHEMA_VERSION = 1
+LEGACY_EVENTS_SUFFIX = ".events.jsonl"  # Per-driver alarm logs written before the store, one JSON event per line
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drivers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calibrations (
+    id INTEGER PRIMARY KEY,
+    driver_id INTEGER NOT NULL REFERENCES drivers(id),
+    created REAL NOT NULL,
+    open_eye REAL NOT NULL,
+    closed_eye REAL NOT NULL,
+    threshold REAL NOT NULL,
+    ratio_source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calibrations_driver_created ON calibrations(driver_id, created);
+CREATE TABLE IF NOT EXISTS alarm_events (
+    id INTEGER PRIMARY KEY,
+    driver_id INTEGER NOT NULL REFERENCES drivers(id),
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS alarm_events_driver_ts ON alarm_events(driver_id, ts);
+CREATE INDEX IF NOT EXISTS alarm_events_ts ON alarm_events(ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Latest calibration of every driver, one row each
+DRIVERS_QUERY = """
+SELECT d.name, c.open_eye, c.closed_eye, c.threshold, c.ratio_source
+FROM drivers d
+JOIN calibrations c ON c.id = (
+    SELECT id FROM calibrations WHERE driver_id = d.id ORDER BY created DESC, id DESC LIMIT 1)
+ORDER BY d.name
+"""
+
+
+def _parse_legacy_profile(path):
+    """ Returns: (name, open_eye, closed_eye, threshold, ratio_source, history lines) of a .txt profile """
+    with open(path, "r") as f:
+        content = f.read()
+    head, _, history = content.partition("--- HISTORY ---")
+    values = {}
+    for line in head.splitlines():
+        if ":" in line:
+            key, val = line.split(":", 1)
+            values[key.strip()] = val.strip()
+    profile = (values["Name"], float(values["OpenEye"]), float(values["ClosedEye"]), float(values["Threshold"]),
+               values.get("RatioSource", DEFAULT_RATIO_SOURCE))
+    return profile + ([line for line in history.splitlines() if "|" in line],)
+
+
+class DriverStore:
+    """Driver profiles, calibrations and alarm history in one SQLite database.
+
+    WAL mode lets the history screen read while the event log's writer
+    thread commits. Every thread gets its own connection (sqlite3
+    connections must not be shared between threads), so a worker thread
+    calls close_thread() before it exits; close() then only has the
+    calling thread's connection left. Calibrations are kept, not
+    overwritten: a driver's profile is their newest calibration.
+
+        store = DriverStore()
+        store.import_profiles(".")  # one-shot: the old Name:/OpenEye:/... .txt files
+        store.add_calibration("John Doe", 40.0, 20.0, 27.0, "lid")
+        store.drivers()             # [(name, open_eye, closed_eye, threshold, ratio_source)]
+        store.add_events([("John Doe", time.time(), "ALARM", "EYES CLOSED")])
+        store.history("John Doe")   # [(ts, kind, reason)], oldest first
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        db = self._db()
+        with db:
+            db.executescript(SCHEMA)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")  # WAL stays consistent; the last commits can be lost
+            db.execute("PRAGMA foreign_keys = ON")
+            self.local.db = db
+            with self.lock:
+                self.connections.append(db)
+        return db
+
+    def close_thread(self):
+        """Closes the calling thread's connection (it is reopened if the thread uses the store again)."""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            return
+        self.local.db = None
+        with self.lock:
+            self.connections.remove(db)
+        db.close()
+
+    def close(self):
+        self.close_thread()
+        with self.lock:
+            if self.connections:
+                print(f"Driver store: {len(self.connections)} connection(s) still open on other threads")
+
+    # --- DRIVERS / CALIBRATIONS ---
+
+    def _driver_id(self, db, name, created=None):
+        row = db.execute("SELECT id FROM drivers WHERE name = ?", (name,)).fetchone()
+        if row:
+            return row[0]
+        return db.execute("INSERT INTO drivers (name, created) VALUES (?, ?)",
+                          (name, time.time() if created is None else created)).lastrowid
+
+    def add_calibration(self, name, open_eye, closed_eye, threshold, ratio_source=DEFAULT_RATIO_SOURCE,
+                        created=None):
+        created = time.time() if created is None else created
+        db = self._db()
+        with db:
+            driver_id = self._driver_id(db, name, created)
+            db.execute("INSERT INTO calibrations (driver_id, created, open_eye, closed_eye, threshold, ratio_source) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", (driver_id, created, open_eye, closed_eye, threshold, ratio_source))
+
+    def drivers(self):
+        """ Returns: [(name, open_eye, closed_eye, threshold, ratio_source)] by name, newest calibration each """
+        return self._db().execute(DRIVERS_QUERY).fetchall()
+
+    def driver(self, name):
+        """ Returns: (open_eye, closed_eye, threshold, ratio_source) of the newest calibration, or None """
+        return self._db().execute(
+            "SELECT c.open_eye, c.closed_eye, c.threshold, c.ratio_source FROM calibrations c "
+            "JOIN drivers d ON d.id = c.driver_id WHERE d.name = ? ORDER BY c.created DESC, c.id DESC LIMIT 1",
+            (name,)).fetchone()
+
+    # --- ALARM EVENTS ---
+
+    def add_events(self, events):
+        """events: (driver name, unix ts, kind, reason) tuples, committed as one transaction"""
+        db = self._db()
+        with db:
+            ids = {}
+            rows = []
+            for name, ts, kind, reason in events:
+                if name not in ids:
+                    ids[name] = self._driver_id(db, name)
+                rows.append((ids[name], ts, kind, reason))
+            db.executemany("INSERT INTO alarm_events (driver_id, ts, kind, reason) VALUES (?, ?, ?, ?)", rows)
+
+    def history(self, name, since=None, limit=None):
+        """ Returns: [(ts, kind, reason)] for the driver, oldest first; limit keeps the newest ones """
+        query = "SELECT e.ts, e.kind, e.reason FROM alarm_events e JOIN drivers d ON d.id = e.driver_id " \
+                "WHERE d.name = ? AND e.ts >= ? ORDER BY e.ts DESC, e.id DESC"
+        params = [name, since if since is not None else float("-inf")]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._db().execute(query, params).fetchall()[::-1]
+
+    # --- IMPORT ---
+
+    def import_profiles(self, directory=".", force=False):
+        """Loads the old .txt profiles (and their HISTORY sections / .events.jsonl logs) once.
+
+        Returns: number of drivers imported (0 if this database already did the import).
+        Files that don't parse as profiles are skipped; the .txt files are left in place.
+        """
+        db = self._db()
+        if not force and db.execute("SELECT 1 FROM meta WHERE key = 'profiles_imported'").fetchone():
+            return 0
+
+        imported = 0
+        with db:
+            for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+                try:
+                    name, open_eye, closed_eye, threshold, source, history = _parse_legacy_profile(path)
+                except (OSError, KeyError, ValueError):
+                    continue
+                if db.execute("SELECT 1 FROM drivers WHERE name = ?", (name,)).fetchone():
+                    continue
+                created = os.path.getmtime(path)
+                driver_id = self._driver_id(db, name, created)
+                db.execute("INSERT INTO calibrations (driver_id, created, open_eye, closed_eye, threshold, "
+                           "ratio_source) VALUES (?, ?, ?, ?, ?, ?)",
+                           (driver_id, created, open_eye, closed_eye, threshold, source))
+
+                rows = []
+                for line in history:
+                    stamp, _, reason = line.partition("|")
+                    try:
+                        ts = time.mktime(time.strptime(stamp.strip(), "%Y-%m-%d %H:%M:%S"))
+                    except ValueError:
+                        continue
+                    rows.append((driver_id, ts, "ALARM", reason.strip()))
+                log = os.path.join(directory, f"{name.replace(' ', '_')}{LEGACY_EVENTS_SUFFIX}")
+                if os.path.exists(log):
+                    with open(log, "r") as f:
+                        for line in f:
+                            try:
+                                ev = json.loads(line)
+                                rows.append((driver_id, float(ev["ts"]), ev["kind"], ev.get("reason")))
+                            except (ValueError, KeyError):
+                                continue  # Torn last line from a power cut
+                db.executemany("INSERT INTO alarm_events (driver_id, ts, kind, reason) VALUES (?, ?, ?, ?)", rows)
+                imported += 1
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('profiles_imported', ?)", (str(time.time()),))
+        return imported
@@ -0,0 +1,214 @@
+from collections import namedtuple
+
+from blink_analyzer import BlinkAnalyzer
+from rolling_window import RollingWindow, TimeEma
+
+# --- RULE CONFIGURATION ---
+SMOOTH_SECONDS = 0.1  # EMA time constant on the raw eye ratio (was a 6-frame average)
+EYES_CLOSED_SECONDS = 1.2  # Rule 1: eyes closed longer than this
+BLINK_COOLDOWN = 0.5  # Minimum time between two counted blinks
+BLINK_LIMIT = 30  # Rule 2: blinks per window
+DROOP_SEGMENT_SECONDS = 2  # One droop event per 2s of continuous drooping
+DROOP_LIMIT = 6  # Rule 3: droop events per window
+DROOP_LEVEL = 0.7  # Droop threshold between closed (0) and open (1) calibration
+PERCLOS_LEVEL = 0.2  # P80: lid at least 80% of the way from open to closed (0.3 = P70)
+PERCLOS_LIMIT = 0.15  # Rule 4: share of the window spent with the eyes closed
+PERCLOS_MIN_SECONDS = 30  # Observed time needed before PERCLOS can raise a warning
+MAX_SAMPLE_GAP = 0.5  # A sample never accounts for more time than this (face lost, stalls)
+WINDOW_SECONDS = 60
+WARNING_COOLDOWN = 8
+COUNTDOWN_SECONDS = 3
+
+# --- STATES / EVENTS ---
+NORMAL = "NORMAL"
+PRE_WARNING = "PRE_WARNING"
+ALARM = "ALARM"
+
+EngineEvent = namedtuple("EngineEvent", ["kind", "timestamp", "reason", "value"])
+# kind: "WARNING" (reason), "COUNTDOWN" (value = seconds left), "ALARM" (reason), "RESET"
+
+
+def detection_enabled(vehicle_state):
+    """Drowsiness rules only run while the vehicle is moving straight."""
+    return vehicle_state != "STATIONARY" and "TURNING" not in vehicle_state
+
+
+class DrowsinessEngine:
+    """The operation screen's drowsiness rules, without any UI.
+
+    Feed it one sample per processed frame with update(timestamp, raw_ratio,
+    vehicle_state); all timing comes from the timestamps, so it runs just as
+    well on recorded data as live. Subscribers get EngineEvents for state
+    transitions (warning raised, countdown tick, alarm, reset).
+    """
+
+    def __init__(self, threshold=0.25, closed_eye=0.20, open_eye=0.40):
+        self.threshold = threshold
+        self.droop_threshold = closed_eye + (open_eye - closed_eye) * DROOP_LEVEL
+        self.perclos_threshold = closed_eye + (open_eye - closed_eye) * PERCLOS_LEVEL
+        self.subscribers = []
+        self.total_blinks = 0  # Not cleared by acknowledge()
+        # Lifetime PERCLOS accumulators (same samples and weighting as Rule 4, not cleared by acknowledge())
+        self.total_observed = 0.0
+        self.total_closed = 0.0
+
+        self.smooth = TimeEma(SMOOTH_SECONDS)
+        self.analyzer = BlinkAnalyzer(threshold, max_gap=MAX_SAMPLE_GAP)
+        self.blinks = RollingWindow(WINDOW_SECONDS)  # value: blink duration
+        self.droops = RollingWindow(WINDOW_SECONDS)
+        # PERCLOS, time weighted: seconds closed / seconds observed over the window
+        self.closed_time = RollingWindow(WINDOW_SECONDS)
+        self.observed_time = RollingWindow(WINDOW_SECONDS)
+        self.last_sample = None
+        self.last_warning = None
+        self.reset_state()
+
+    def reset_state(self):
+        self.status = NORMAL
+        self.alarm_reason = None
+        self.warn_start = 0
+        self.countdown = None
+
+        self.raw = 0.0
+        self.ear = 0.0
+        self.active = False  # Rules were evaluated on the last sample
+        self.is_open = True
+        self.is_drooping = False
+
+        self.analyzer.reset()
+        self.last_blink = None  # Start of the last counted blink
+        self.last_blink_info = None  # Last Blink from the analyzer (duration, velocities, interval)
+        self.blinks.clear()
+        self.droop_start = None
+        self.droop_segments = 0
+        self.droops.clear()
+        self.closed_time.clear()
+        self.observed_time.clear()
+        self.last_sample = None
+        self.smooth.reset()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def _emit(self, events, kind, timestamp, reason=None, value=None):
+        ev = EngineEvent(kind, timestamp, reason, value)
+        events.append(ev)
+        for callback in self.subscribers:
+            callback(ev)
+
+    def blink_count(self):
+        return self.blinks.count
+
+    def blink_duration(self):
+        """ Returns: mean blink duration over the window, seconds """
+        return self.blinks.mean
+
+    def droop_count(self):
+        return self.droops.count
+
+    def perclos(self):
+        """ Returns: fraction of the observed window time with the eyes closed (0..1) """
+        observed = self.observed_time.total
+        return self.closed_time.total / observed if observed > 0 else 0.0
+
+    def acknowledge(self, timestamp):
+        """Driver answered the warning / stopped the alarm: clear everything and restart the cooldown."""
+        self.reset_state()
+        self.last_warning = timestamp
+        events = []
+        self._emit(events, "RESET", timestamp)
+        return events
+
+    def update(self, timestamp, raw, vehicle_state):
+        """ Returns: list of EngineEvents raised by this sample """
+        events = []
+        now = timestamp
+
+        self.raw = raw
+        self.ear = self.smooth.update(now, raw)
+        self.active = False
+
+        self.blinks.expire(now)
+        self.droops.expire(now)
+        self.closed_time.expire(now)
+        self.observed_time.expire(now)
+
+        if self.status == NORMAL and detection_enabled(vehicle_state):
+            self.active = True
+            self._evaluate_rules(now, events)
+
+        elif self.status == PRE_WARNING:
+            rem = COUNTDOWN_SECONDS - int(now - self.warn_start)
+            if rem > 0:
+                if rem != self.countdown:
+                    self.countdown = rem
+                    self._emit(events, "COUNTDOWN", now, self.alarm_reason, rem)
+            else:
+                self.status = ALARM
+                self._emit(events, "ALARM", now, self.alarm_reason)
+
+        return events
+
+    def _raise_warning(self, now, reason, events):
+        # Cooldown / don't overwrite an existing warning
+        if self.last_warning is not None and (now - self.last_warning) < WARNING_COOLDOWN:
+            return
+        if self.status != NORMAL:
+            return
+
+        self.status = PRE_WARNING
+        self.alarm_reason = reason
+        self.warn_start = now
+        self.last_warning = now
+        self.countdown = COUNTDOWN_SECONDS
+        self._emit(events, "WARNING", now, reason, COUNTDOWN_SECONDS)
+
+    def _evaluate_rules(self, now, events):
+        # Closure edges are interpolated between samples from the capture timestamps
+        blink = self.analyzer.update(now, self.raw)
+        self.is_open = not self.analyzer.closed
+        self.is_drooping = self.ear < self.droop_threshold
+
+        # --- Rule 1: Eyes Closed ---
+        if not self.is_open:
+            if now - self.analyzer.closed_since > EYES_CLOSED_SECONDS:
+                self._raise_warning(now, "EYES CLOSED", events)
+        elif blink is not None:
+            self.last_blink_info = blink
+            if self.last_blink is None or blink.start - self.last_blink >= BLINK_COOLDOWN:
+                self.blinks.add(now, blink.duration)
+                self.last_blink = blink.start
+                self.total_blinks += 1
+
+            if self.blinks.count >= BLINK_LIMIT:
+                self._raise_warning(now, "FREQUENT BLINKING", events)
+
+        # --- Rule 2: Drooping Eyelids ---
+        if self.is_drooping:
+            if self.droop_start is None:
+                self.droop_start = now
+                self.droop_segments = 0
+            else:
+                segments = int((now - self.droop_start) // DROOP_SEGMENT_SECONDS)
+                if segments > self.droop_segments:
+                    for _ in range(segments - self.droop_segments):
+                        self.droops.add(now)
+                    self.droop_segments = segments
+
+                    if self.droops.count >= DROOP_LIMIT:
+                        self._raise_warning(now, "DROPPING EYELIDS", events)
+        else:
+            self.droop_start = None
+            self.droop_segments = 0
+
+        # --- Rule 4: PERCLOS ---
+        if self.last_sample is not None:
+            dt = min(now - self.last_sample, MAX_SAMPLE_GAP)
+            closed = dt if self.raw <= self.perclos_threshold else 0.0
+            self.observed_time.add(now, dt)
+            self.closed_time.add(now, closed)
+            self.total_observed += dt
+            self.total_closed += closed
+            if self.observed_time.total >= PERCLOS_MIN_SECONDS and self.perclos() >= PERCLOS_LIMIT:
+                self._raise_warning(now, "HIGH PERCLOS", events)
+        self.last_sample = now
@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+
+
+class EventLog:
+    """Alarm history writer: events go to the DriverStore from a background thread.
+
+    log() only puts the event on a queue, so it costs the same whatever the
+    history size and never touches the database on the Tk thread. The
+    writer commits the queued events to the store's alarm_events table in
+    batches, one transaction each: when sync_every events are waiting or
+    sync_seconds after the first uncommitted one, whichever comes first. A
+    power cut loses at most that batch.
+
+        events = EventLog(store)
+        events.log("John Doe", "ALARM", "EYES CLOSED")
+        events.close()  # commits whatever is queued
+    """
+
+    def __init__(self, store, sync_every=32, sync_seconds=1.0):
+        self.store = store
+        self.sync_every = sync_every
+        self.sync_seconds = sync_seconds
+        self.queue = queue.Queue()
+        self.pending = []  # (driver, ts, kind, reason) waiting for the next commit
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+        # Counters
+        self.written = 0
+        self.syncs = 0
+        self.errors = 0
+
+    def log(self, driver, kind, reason=None, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self.queue.put((driver, round(timestamp, 3), kind, reason))
+
+    def _write_loop(self):
+        try:
+            self._write_events()
+        finally:
+            self.store.close_thread()  # The store's connection for this thread dies with it
+
+    def _write_events(self):
+        first_pending = None
+        while True:
+            timeout = None if first_pending is None else \
+                max(first_pending + self.sync_seconds - time.monotonic(), 0.0)
+            try:
+                event = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                event = False  # Commit deadline
+
+            if event:
+                self.pending.append(event)
+                self.written += 1
+                if first_pending is None:
+                    first_pending = time.monotonic()
+
+            due = first_pending is not None and time.monotonic() - first_pending >= self.sync_seconds
+            if self.pending and (event is None or due or len(self.pending) >= self.sync_every):
+                self._sync()
+                first_pending = None
+            if event is None:
+                break
+
+    def _sync(self):
+        try:
+            self.store.add_events(self.pending)
+        except Exception as e:
+            self.errors += 1
+            print("Event log commit failed:", e)
+        self.pending = []
+        self.syncs += 1
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+        self.thread = None
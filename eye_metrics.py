@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+# Upper lid, lower lid, outer corner, inner corner (MediaPipe face mesh ids)
+EYE_LANDMARKS = (159, 23, 130, 243)
+
+# Six-point EAR contours, p1..p6: corner, two upper lid, corner, two lower lid
+RIGHT_EYE_EAR = (33, 160, 158, 133, 153, 144)
+LEFT_EYE_EAR = (362, 385, 387, 263, 373, 380)
+EAR_LANDMARKS = RIGHT_EYE_EAR + LEFT_EYE_EAR
+# Every id above by eye (the lid ratio's four points are on the RIGHT_EYE_EAR eye)
+EYE_GROUPS = (EYE_LANDMARKS + RIGHT_EYE_EAR, LEFT_EYE_EAR)
+
+# Ratio sources a driver profile can be calibrated with
+#   lid: one lid distance over one eye width, left eye (the original ratio)
+#   ear: standard multi-pair EAR averaged over both eyes, holds up better under head yaw
+RATIO_SOURCES = {"lid": EYE_LANDMARKS, "ear": EAR_LANDMARKS}
+DEFAULT_RATIO_SOURCE = "lid"
+
+# Index pairs into EAR_LANDMARKS: (p2, p6), (p3, p5), (p1, p4) for each eye
+_EAR_FROM = [1, 2, 0, 7, 8, 6]
+_EAR_TO = [5, 4, 3, 11, 10, 9]
+
+
+def eye_ratio(face):
+    """Vertical (159-23) over horizontal (130-243) eye distance, x100.
+
+    Same numbers as detector.findDistance() in the live loop, without
+    needing a detector instance.
+    """
+    v = math.hypot(face[23][0] - face[159][0], face[23][1] - face[159][1])
+    h = math.hypot(face[243][0] - face[130][0], face[243][1] - face[130][1])
+    if h == 0:
+        return 0.0
+    return (v / h) * 100
+
+
+def landmark_points(faces, ids):
+    """ Returns: float array (n_faces, len(ids), 2) of the given landmarks """
+    return np.array([[face[i][:2] for i in ids] for face in faces], dtype=np.float64).reshape(-1, len(ids), 2)
+
+
+def eye_ratios(points):
+    """Batch eye_ratio(): points (..., 4, 2) in EYE_LANDMARKS order. Returns: (...) array."""
+    points = np.asarray(points, dtype=np.float64)
+    v = np.linalg.norm(points[..., 1, :] - points[..., 0, :], axis=-1)
+    h = np.linalg.norm(points[..., 3, :] - points[..., 2, :], axis=-1)
+    return np.divide(v, h, out=np.zeros_like(v), where=h > 0) * 100
+
+
+def eye_aspect_ratios(points):
+    """Batch multi-pair EAR, mean of both eyes, x100 (same scale as eye_ratio).
+
+    points: (..., 12, 2) in EAR_LANDMARKS order. Per eye
+    EAR = (|p2-p6| + |p3-p5|) / (2 |p1-p4|); an eye with zero width counts as 0.
+    Returns: (...) array.
+    """
+    p = np.asarray(points, dtype=np.float64)
+    # All six distances (three per eye) in one go: p2-p6, p3-p5, p1-p4 per eye
+    d = p[..., _EAR_FROM, :] - p[..., _EAR_TO, :]
+    d = np.hypot(d[..., 0], d[..., 1]).reshape(p.shape[:-2] + (2, 3))  # (..., eye, pair)
+    vertical = d[..., 0] + d[..., 1]
+    horizontal = 2 * d[..., 2]
+    ear = np.divide(vertical, horizontal, out=np.zeros_like(vertical), where=horizontal > 0)
+    return ear.mean(axis=-1) * 100
+
+
+def eye_aspect_ratio(face):
+    """Multi-pair EAR of both eyes for one face, x100."""
+    return float(eye_aspect_ratios([face[i][:2] for i in EAR_LANDMARKS]))
+
+
+def ratio_function(source):
+    """ Returns: face -> ratio for a RATIO_SOURCES key """
+    if source == "ear":
+        return eye_aspect_ratio
+    if source == "lid":
+        return eye_ratio
+    raise ValueError(f"Unknown ratio source: {source}")
+
+
+def batch_ratios(points, source):
+    """Ratios for many frames at once: points from landmark_points(faces, RATIO_SOURCES[source])."""
+    if source == "ear":
+        return eye_aspect_ratios(points)
+    if source == "lid":
+        return eye_ratios(points)
+    raise ValueError(f"Unknown ratio source: {source}")
@@ -0,0 +1,134 @@
+import cv2
+import numpy as np
+
+from eye_metrics import EYE_GROUPS
+
+
+class EyeTracker:
+    """Runs full face mesh only every few frames and tracks the eye landmarks in between.
+
+    Between full detections the eye points are followed with pyramidal
+    Lucas-Kanade optical flow on a small grey crop around the eye, which is
+    a fraction of the cost of findFaceMesh on the whole frame. Tracking is
+    dropped (and face mesh re-run on that frame) when:
+      - refresh_every frames have passed since the last full detection
+      - a point is lost or fails the forward-backward check
+      - on either eye, the tracked points' spread or any point's position
+        relative to the rest moved too far from the last detection; optical
+        flow follows texture, not eyelids, so blinks are always measured by
+        the mesh itself.
+    Every tracked id takes part, grouped by eye with EYE_GROUPS (ids on
+    neither eye form one more group), so the check covers whichever ratio
+    source's landmarks are being followed.
+    """
+
+    def __init__(self, detector, ids=(159, 23, 130, 243), refresh_every=10, margin=24,
+                 max_fb_error=1.0, max_point_change=0.06, max_width_change=0.15):
+        self.detector = detector
+        self.refresh_every = refresh_every
+        self.margin = margin
+        self.max_fb_error = max_fb_error
+        self.max_point_change = max_point_change
+        self.max_width_change = max_width_change
+        self._set_groups(ids)
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+        self.points = None  # float32 (n, 1, 2) in frame coordinates
+        self.roi = None  # x0, y0, x1, y1
+        self.roi_gray = None
+        self.refs = []  # (centred points, width) of each eye group at the last detection
+        self.frames_since_full = 0
+
+        # Counters
+        self.full_runs = 0
+        self.tracked_runs = 0
+
+    def reset(self):
+        self.points = None
+        self.roi_gray = None
+
+    def set_ids(self, ids):
+        """Changes the tracked landmarks; the next frame runs a full detection."""
+        self._set_groups(ids)
+        self.reset()
+
+    def _set_groups(self, ids):
+        self.ids = tuple(ids)
+        groups = [[k for k, i in enumerate(self.ids) if i in eye] for eye in EYE_GROUPS]
+        grouped = set(i for eye in EYE_GROUPS for i in eye)
+        groups.append([k for k, i in enumerate(self.ids) if i not in grouped])
+        self.groups = [np.array(g) for g in groups if len(g) >= 2]
+
+    def process(self, frame):
+        """ Returns: faces like findFaceMesh (a tracked face only holds the tracked ids) """
+        if self.points is not None and self.frames_since_full < self.refresh_every:
+            face = self._track(frame)
+            if face is not None:
+                self.frames_since_full += 1
+                self.tracked_runs += 1
+                return [face]
+        return self._detect(frame)
+
+    def _detect(self, frame):
+        _, faces = self.detector.findFaceMesh(frame, draw=False)
+        self.full_runs += 1
+        self.frames_since_full = 0
+        if not faces:
+            self.reset()
+            return []
+
+        f = faces[0]
+        self.points = np.array([f[i] for i in self.ids], dtype=np.float32).reshape(-1, 1, 2)
+        self.refs = [self._shape(self.points[g]) for g in self.groups]
+        self._set_roi(frame)
+        return faces
+
+    def _track(self, frame):
+        x0, y0, x1, y1 = self.roi
+        gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        if gray.shape != self.roi_gray.shape:
+            return None
+
+        offset = np.array([x0, y0], dtype=np.float32)
+        prev_pts = self.points - offset
+        new_pts, status, _ = cv2.calcOpticalFlowPyrLK(self.roi_gray, gray, prev_pts, None, **self.lk_params)
+        if new_pts is None or not status.all():
+            return None
+
+        # Forward-backward consistency
+        back_pts, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.roi_gray, new_pts, None, **self.lk_params)
+        if back_pts is None or not back_status.all():
+            return None
+        if np.abs(back_pts - prev_pts).reshape(-1, 2).max() > self.max_fb_error:
+            return None
+
+        points = new_pts + offset
+        for g, (ref_shape, ref_width) in zip(self.groups, self.refs):
+            shape, width = self._shape(points[g])
+            if abs(width - ref_width) > self.max_width_change * ref_width:
+                return None
+            # Compared at the reference scale, so a head moving closer doesn't count as drift
+            if np.abs(shape * (ref_width / width) - ref_shape).max() > self.max_point_change * ref_width:
+                return None
+
+        self.points = points
+        self._set_roi(frame)
+        return {i: [int(round(x)), int(round(y))] for i, (x, y) in zip(self.ids, points.reshape(-1, 2))}
+
+    @staticmethod
+    def _shape(points):
+        """ Returns: the points relative to their centroid, and their spread (largest extent, >= 1 px) """
+        pts = points.reshape(-1, 2)
+        width = float(np.ptp(pts, axis=0).max())
+        return pts - pts.mean(axis=0), max(width, 1.0)
+
+    def _set_roi(self, frame):
+        h, w = frame.shape[:2]
+        pts = self.points.reshape(-1, 2)
+        x0 = max(int(pts[:, 0].min()) - self.margin, 0)
+        y0 = max(int(pts[:, 1].min()) - self.margin, 0)
+        x1 = min(int(pts[:, 0].max()) + self.margin + 1, w)
+        y1 = min(int(pts[:, 1].max()) + self.margin + 1, h)
+        self.roi = (x0, y0, x1, y1)
+        self.roi_gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
@@ -0,0 +1,108 @@
+import os
+import time
+
+from drowsiness_engine import detection_enabled
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def read_cpu_temp(path=THERMAL_ZONE):
+    """ Returns: SoC temperature in degrees C, or None where there is no thermal zone """
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def read_cpu_load():
+    """ Returns: 1-minute load average per core (1.0 = every core busy), or None """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+
+class FrameGovernor:
+    """Chooses the camera frame rate from vehicle state, eye ratio and CPU health.
+
+    - Rules active (DRIVING, see detection_enabled): full rate.
+    - STATIONARY / TURNING: the rules are paused, so once that has held for
+      hold_seconds the rate drops to idle_fps. Any return to an active state
+      ramps straight back up.
+    - Eye ratio within near_margin of the closed threshold while driving:
+      full rate, whatever else is going on.
+    - CPU at or above temp_limit / load_limit: capped at hot_fps until it is
+      back below the limits minus the hysteresis.
+
+    Call update() once per processed frame; it returns the minimum interval
+    between frames to hand to CameraStream.min_interval (0 = as fast as the
+    camera delivers).
+    """
+
+    def __init__(self, full_fps=0, idle_fps=5, hot_fps=10, hold_seconds=2.0, near_margin=0.15,
+                 temp_limit=75.0, temp_hysteresis=5.0, load_limit=0.9, load_hysteresis=0.15,
+                 health_every=2.0, temp_reader=read_cpu_temp, load_reader=read_cpu_load):
+        self.full_fps = full_fps  # 0 = camera rate
+        self.idle_fps = idle_fps
+        self.hot_fps = hot_fps
+        self.hold_seconds = hold_seconds
+        self.near_margin = near_margin
+        self.temp_limit = temp_limit
+        self.temp_hysteresis = temp_hysteresis
+        self.load_limit = load_limit
+        self.load_hysteresis = load_hysteresis
+        self.health_every = health_every
+        self.temp_reader = temp_reader
+        self.load_reader = load_reader
+
+        self.paused_since = None
+        self.hot = False
+        self.temp = None
+        self.load = None
+        self.last_health = None
+        self.mode = "full"
+        self.fps = full_fps
+
+    def _check_health(self, now):
+        if self.last_health is not None and now - self.last_health < self.health_every:
+            return
+        self.last_health = now
+        self.temp = self.temp_reader()
+        self.load = self.load_reader()
+
+        if self.hot:
+            cool = (self.temp is None or self.temp < self.temp_limit - self.temp_hysteresis) and \
+                   (self.load is None or self.load < self.load_limit - self.load_hysteresis)
+            self.hot = not cool
+        else:
+            self.hot = (self.temp is not None and self.temp >= self.temp_limit) or \
+                       (self.load is not None and self.load >= self.load_limit)
+
+    def update(self, vehicle_state, ear=None, threshold=None, now=None):
+        """ Returns: minimum seconds between camera frames (0 = no limit) """
+        now = time.monotonic() if now is None else now
+        self._check_health(now)
+
+        driving = detection_enabled(vehicle_state)
+        if driving:
+            self.paused_since = None
+        elif self.paused_since is None:
+            self.paused_since = now
+
+        near = driving and ear is not None and threshold is not None and \
+            ear <= threshold * (1 + self.near_margin)
+
+        if near:
+            mode, fps = "near", self.full_fps
+        elif not driving and now - self.paused_since >= self.hold_seconds:
+            mode, fps = "idle", self.idle_fps
+        else:
+            mode, fps = "full", self.full_fps
+
+        if self.hot and not near and (fps == 0 or fps > self.hot_fps):
+            mode, fps = "hot", self.hot_fps
+
+        self.mode = mode
+        self.fps = fps
+        return 1.0 / fps if fps else 0.0
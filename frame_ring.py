@@ -0,0 +1,176 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _align(n, to=64):
+    return (n + to - 1) // to * to
+
+
+class FrameRing:
+    """Ring of preallocated frame slots in shared memory.
+
+    One writer (the capture thread) decodes straight into a free slot and
+    commits it with a sequence number and capture timestamp. Readers, in this
+    process or in a worker process attached by name, pin a slot while they use
+    it and get a NumPy view of it - no frame is ever copied or allocated per
+    frame. The writer skips pinned slots, so a pinned view is never torn.
+
+    Layout: head[2] (latest seq, latest slot) | slot_seq[slots] |
+    slot_ts[slots] | pins[readers, slots] | frames[slots, h, w, c]
+
+    A slot_seq of -1 means the writer is filling that slot. The pin/recheck
+    handshake is lock-free-ish: each pin word has exactly one writer.
+    """
+
+    def __init__(self, shm, shape, dtype=np.uint8, slots=6, readers=2, owner=False):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.readers = readers
+        self.owner = owner
+
+        off = 0
+        self.head = np.ndarray((2,), dtype=np.int64, buffer=shm.buf, offset=off)
+        off += self.head.nbytes
+        self.slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=off)
+        off += self.slot_seq.nbytes
+        self.slot_ts = np.ndarray((slots,), dtype=np.float64, buffer=shm.buf, offset=off)
+        off += self.slot_ts.nbytes
+        self.pins = np.ndarray((readers, slots), dtype=np.int64, buffer=shm.buf, offset=off)
+        off = _align(off + self.pins.nbytes)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=shm.buf, offset=off)
+
+        # Process-local state
+        self._write_slot = -1
+        self._writing = None
+        self._held = [None] * readers
+
+    @staticmethod
+    def nbytes(shape, dtype=np.uint8, slots=6, readers=2):
+        header = 8 * (2 + slots + slots + readers * slots)
+        return _align(header) + slots * int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+    @classmethod
+    def create(cls, shape, dtype=np.uint8, slots=6, readers=2):
+        size = cls.nbytes(shape, dtype, slots, readers)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, shape, dtype, slots, readers, owner=True)
+        ring.head[:] = (0, -1)
+        ring.slot_seq[:] = 0
+        ring.slot_ts[:] = 0.0
+        ring.pins[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, spec):
+        """Attach to a ring created elsewhere, from the tuple returned by spec()."""
+        name, shape, dtype, slots, readers = spec
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, shape, dtype, slots, readers)
+
+    def spec(self):
+        return self.shm.name, self.shape, self.dtype.str, self.slots, self.readers
+
+    # --- WRITER ---
+    def begin_write(self):
+        """ Returns: writable view of a free slot, or None if every slot is pinned """
+        for _ in range(self.slots):
+            slot = (self._write_slot + 1) % self.slots
+            self._write_slot = slot
+            if self.pins[:, slot].any():
+                continue
+
+            old_seq = self.slot_seq[slot]
+            self.slot_seq[slot] = -1
+            # Re-check: a reader may have pinned it between our check and the mark
+            if self.pins[:, slot].any():
+                self.slot_seq[slot] = old_seq
+                continue
+
+            self._writing = slot
+            return self.frames[slot]
+        return None
+
+    def commit(self, timestamp):
+        """ Returns: seq of the committed frame """
+        slot = self._writing
+        self._writing = None
+        seq = int(self.head[0]) + 1
+        self.slot_ts[slot] = timestamp
+        self.slot_seq[slot] = seq
+        self.head[1] = slot
+        self.head[0] = seq
+        return seq
+
+    def abort(self):
+        """Gives back a slot from begin_write() without publishing it."""
+        if self._writing is not None:
+            self.slot_seq[self._writing] = 0
+            self._writing = None
+
+    # --- READERS ---
+    def latest_seq(self):
+        return int(self.head[0])
+
+    def acquire(self, reader=0, after_seq=0):
+        """Pins the newest frame for this reader (releasing its previous one).
+
+        Returns: seq, timestamp, frame view - or (after_seq, None, None) if
+        nothing newer than after_seq has been committed.
+        """
+        for _ in range(3):
+            slot = int(self.head[1])
+            if slot < 0 or int(self.head[0]) <= after_seq:
+                return after_seq, None, None
+
+            self.release(reader)
+            self.pins[reader, slot] = 1
+            seq = int(self.slot_seq[slot])
+            if seq > after_seq:
+                self._held[reader] = slot
+                return seq, float(self.slot_ts[slot]), self.frames[slot]
+            self.pins[reader, slot] = 0  # Writer got there first, retry
+        return after_seq, None, None
+
+    def release(self, reader=0):
+        slot = self._held[reader]
+        if slot is not None:
+            self.pins[reader, slot] = 0
+            self._held[reader] = None
+
+    def pin(self, seq, reader):
+        """Pins the slot holding seq on behalf of another reader (e.g. a worker process).
+
+        Returns: slot index, or None if seq has already been overwritten.
+        The reader gives it back with unpin(slot, reader).
+        """
+        for slot in range(self.slots):
+            if self.slot_seq[slot] == seq:
+                self.pins[reader, slot] = 1
+                if self.slot_seq[slot] == seq:
+                    return slot
+                self.pins[reader, slot] = 0
+        return None
+
+    def unpin(self, slot, reader):
+        self.pins[reader, slot] = 0
+
+    def unpin_all(self, reader):
+        """Drops every pin of a reader that is gone (e.g. a stopped worker process)."""
+        if self.pins is not None:
+            self.pins[reader, :] = 0
+
+    def valid(self, slot, seq):
+        return int(self.slot_seq[slot]) == seq
+
+    def close(self):
+        # Drop views before closing the mapping
+        self.head = self.slot_seq = self.slot_ts = self.pins = self.frames = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception:
+            pass
@@ -0,0 +1,361 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from mpu_sensor import ACCEL_SCALE, ACCEL_XOUT_H, BLOCK_LENGTH, GYRO_SCALE, MPU_ADDRESS, FakeSMBus, MPU_Sensor
+
+# --- FILE FORMAT ---
+# Header: magic, version, record size. Then fixed-width records, little-endian:
+# capture time (float64, monotonic seconds) + the raw burst read (7 x int16, big-endian
+# as on the wire: ACCEL_XYZ, TEMP, GYRO_XYZ). A torn record at the end is ignored.
+# Each run appended to an existing trace starts with a SEGMENT_MARK record; its clock is
+# rebased to start SEGMENT_GAP after the previous run's last record.
+MAGIC = b"DCIMU\x00\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHH")
+RECORD = struct.Struct("<d14s")
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("raw", ">i2", (7,))])
+assert RECORD_DTYPE.itemsize == RECORD.size
+SEGMENT_MARK = b"\x80\x00" * 7  # Every register at -32768: never a real burst read (TEMP alone would be -60 C)
+SEGMENT_GAP = 1.0  # Seconds between the end of one run and the start of the next
+
+# Checked-in trace: 2.5 s parked, 3 s of 0.2 g +- 0.02 g forward with no vibration on the other axes,
+# then 5 s of a perfectly smooth 0.15 g push. The car is moving from ~3 s on (write_synthetic_trace(SMOOTH_SEGMENTS)).
+SMOOTH_TRACE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "imu_smooth_accel.imu")
+SMOOTH_SEGMENTS = (  # seconds, acc_y (g), acc_y noise (g), noise on the other axes (g)
+    (2.5, 0.0, 0.002, 0.002),
+    (3.0, 0.2, 0.02, 0.0),
+    (5.0, 0.15, 0.0, 0.0),
+)
+SMOOTH_MOVING = (3.5, 10.5)  # Seconds after the start that must never read STATIONARY
+
+
+class TraceWriter:
+    """Appends raw MPU samples to a trace file.
+
+    Opening an existing trace appends to it as a new segment: a record torn
+    by a power cut is cut off first, and since the clock restarts with
+    every boot, this run's timestamps are shifted to carry on after the
+    last recorded one. Records are buffered by the file object; flush() /
+    close() push them out.
+
+        with TraceWriter("drive.imu") as trace:
+            trace.append(time.monotonic(), block)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_t = None  # Last recorded time of the run being appended to
+        self.offset = None  # Added to this run's timestamps, set by the first append
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            _check_header(path)
+            self.f = open(path, "r+b")
+            count = (os.fstat(self.f.fileno()).st_size - HEADER.size) // RECORD.size
+            self.f.truncate(HEADER.size + count * RECORD.size)
+            if count:
+                self.f.seek(HEADER.size + (count - 1) * RECORD.size)
+                self.last_t = RECORD.unpack(self.f.read(RECORD.size))[0]
+            self.f.seek(0, os.SEEK_END)
+        else:
+            self.f = open(path, "wb")
+            self.f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self.records = 0
+
+    def append(self, t, block):
+        """block: the BLOCK_LENGTH bytes read from ACCEL_XOUT_H"""
+        if self.offset is None:
+            self.offset = 0.0
+            if self.last_t is not None:
+                self.offset = self.last_t + SEGMENT_GAP - t
+                self.f.write(RECORD.pack(t + self.offset, SEGMENT_MARK))
+        self.f.write(RECORD.pack(t + self.offset, bytes(block)))
+        self.records += 1
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        magic, version, size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or size != RECORD.size:
+        raise IOError(f"{path}: not a version {VERSION} IMU trace")
+
+
+class TraceReader:
+    """Memory-mapped view of a trace file.
+
+    `records` is a NumPy structured array over the mapping (fields t, raw),
+    so opening a long drive reads nothing up front and slicing is free.
+    It includes the SEGMENT_MARK records between appended runs.
+
+        trace = TraceReader("drive.imu")
+        len(trace), trace.duration
+        trace.segments()  # [(start, stop)] record ranges, one per recorded run
+        trace.samples()   # (n, 6) array: ax, ay, az (g), gx, gy, gz (deg/s), markers left out
+    """
+
+    def __init__(self, path):
+        self.path = path
+        _check_header(path)
+        self.f = open(path, "rb")
+        size = os.fstat(self.f.fileno()).st_size
+        count = (size - HEADER.size) // RECORD.size
+        if count > 0:
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.records = np.frombuffer(self.mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+        else:
+            self.mm = None
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        return float(self.records["t"][-1] - self.records["t"][0]) if len(self.records) > 1 else 0.0
+
+    def block(self, i):
+        """ Returns: record i's raw register bytes, as read_i2c_block_data returned them """
+        return list(self.records["raw"][i].astype(">i2").tobytes())
+
+    def _marks(self):
+        return (self.records["raw"] == -32768).all(axis=1)
+
+    def segments(self):
+        bounds = [-1] + np.flatnonzero(self._marks()).tolist() + [len(self.records)]
+        return [(a + 1, b) for a, b in zip(bounds, bounds[1:]) if b > a + 1]
+
+    def samples(self):
+        raw = self.records["raw"][~self._marks()].astype(np.float64)
+        return np.concatenate([raw[:, 0:3] / ACCEL_SCALE, raw[:, 4:7] / GYRO_SCALE], axis=1)
+
+    def close(self):
+        self.records = None
+        if self.mm is not None:
+            self.mm.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingBus:
+    """smbus wrapper that appends every accel/gyro burst read to a TraceWriter.
+
+        sensor = MPU_Sensor(bus=RecordingBus(open_bus(), TraceWriter("drive.imu")))
+    """
+
+    def __init__(self, bus, writer, clock=time.monotonic):
+        self.bus = bus
+        self.writer = writer
+        self.clock = clock
+
+    def write_byte_data(self, addr, register, value):
+        return self.bus.write_byte_data(addr, register, value)
+
+    def read_byte_data(self, addr, register):
+        return self.bus.read_byte_data(addr, register)
+
+    def read_i2c_block_data(self, addr, register, length):
+        data = self.bus.read_i2c_block_data(addr, register, length)
+        if register == ACCEL_XOUT_H and length == BLOCK_LENGTH:
+            self.writer.append(self.clock(), data)
+        return data
+
+
+class ReplayBus:
+    """smbus stand-in that serves a recorded trace, one record per burst read.
+
+    speed: 1 = real time (reads block until the record's time comes round),
+    N = N times faster, 0 = as fast as the reads come. clock() returns the
+    recorded time of the last record served - give it to MPU_Sensor so the
+    vehicle model sees the recorded timing at any replay speed. Reads past
+    the end raise EOFError (get_vehicle_status() then reports "ERROR").
+    start / stop: the record range to serve, e.g. one of trace.segments().
+
+        bus = ReplayBus(TraceReader("drive.imu"), speed=0)
+        sensor = MPU_Sensor(bus=bus, clock=bus.clock)
+    """
+
+    def __init__(self, trace, speed=1.0, address=MPU_ADDRESS, start=0, stop=None):
+        self.trace = trace
+        self.speed = speed
+        self.address = address
+        self.index = start
+        self.stop = len(trace) if stop is None else stop
+        self.t = float(trace.records["t"][start]) if start < self.stop else 0.0
+        self.t_start = self.t
+        self.wall_start = None
+
+    @property
+    def finished(self):
+        return self.index >= self.stop
+
+    def clock(self):
+        return self.t
+
+    def write_byte_data(self, addr, register, value):
+        pass  # Wake-up and config writes have nothing to act on
+
+    def read_byte_data(self, addr, register):
+        raise OSError(5, "ReplayBus only serves burst reads")
+
+    def read_i2c_block_data(self, addr, register, length):
+        if addr != self.address:
+            raise OSError(121, "Remote I/O error")
+        if self.finished:
+            raise EOFError("end of IMU trace")
+        t = float(self.trace.records["t"][self.index])
+        if self.speed > 0:
+            if self.wall_start is None:
+                self.wall_start = time.monotonic()
+            delay = self.wall_start + (t - self.t_start) / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        block = self.trace.block(self.index)
+        self.t = t
+        self.index += 1
+        return block[:length]
+
+
+def write_synthetic_trace(path, segments=SMOOTH_SEGMENTS, rate_hz=200, seed=0):
+    """Records a synthetic drive through FakeSMBus + RecordingBus, i.e. exactly what a live recording stores.
+
+    segments: (seconds, acc_y, acc_y_noise, other_noise) - gravity on z, gaussian noise in g.
+    """
+    rng = random.Random(seed)
+    bus = FakeSMBus()
+    t = [0.0]
+    with TraceWriter(path) as writer:
+        sensor = MPU_Sensor(bus=RecordingBus(bus, writer, clock=lambda: t[0]), clock=lambda: t[0])
+        for seconds, acc_y, acc_y_noise, other_noise in segments:
+            for _ in range(int(round(seconds * rate_hz))):
+                bus.set_motion(acc_x=rng.gauss(0, other_noise) if other_noise else 0.0,
+                               acc_y=acc_y + (rng.gauss(0, acc_y_noise) if acc_y_noise else 0.0),
+                               acc_z=1.0 + (rng.gauss(0, other_noise) if other_noise else 0.0))
+                sensor.read_sample()
+                t[0] += 1.0 / rate_hz
+
+
+def replay_trace(trace, speed=0.0):
+    """Runs each segment of a trace through a fresh MPU_Sensor, as each run started the app.
+
+    Returns: list of (t, status, speed_kph) for every sample
+    """
+    states = []
+    for start, stop in trace.segments():
+        bus = ReplayBus(trace, speed=speed, start=start, stop=stop)
+        sensor = MPU_Sensor(bus=bus, clock=bus.clock)
+        while not bus.finished:
+            status, speed_kph = sensor.get_vehicle_status()
+            states.append((bus.t, status, speed_kph))
+    return states
+
+
+def check_append():
+    """Writes a trace, tears its last record, appends a second run from a restarted clock and reads it back.
+
+    Returns: list of problems found ([] = OK)
+    """
+    segments = ((0.5, 0.0, 0.002, 0.002), (0.5, 0.2, 0.02, 0.0))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "append.imu")
+        write_synthetic_trace(path, segments, seed=1)
+        with TraceReader(path) as trace:
+            first = trace.records.copy()
+        with open(path, "ab") as f:
+            f.write(RECORD.pack(first["t"][-1] + 0.005, SEGMENT_MARK)[:RECORD.size // 2])  # Power cut mid-record
+        write_synthetic_trace(path, segments, seed=2)
+
+        problems = []
+        if (os.path.getsize(path) - HEADER.size) % RECORD.size:
+            problems.append("file is not a whole number of records")
+        with TraceReader(path) as trace:
+            n = len(first)
+            if len(trace) != 2 * n + 1:
+                problems.append(f"{len(trace)} records, expected {2 * n + 1}")
+            elif not (trace.records["raw"][:n] == first["raw"]).all():
+                problems.append("first run changed")
+            if trace.segments() != [(0, n), (n + 1, 2 * n + 1)]:
+                problems.append(f"segments {trace.segments()}, expected [(0, {n}), ({n + 1}, {2 * n + 1})]")
+            if (np.diff(trace.records["t"]) < 0).any():
+                problems.append("timestamps go backwards")
+            if len(trace.samples()) != 2 * n:
+                problems.append("samples() includes segment markers")
+            if len(replay_trace(trace)) != 2 * n:
+                problems.append("replay did not serve every sample")
+        return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded IMU trace through the vehicle logic.")
+    parser.add_argument("trace", nargs="?", help="trace file recorded with DROWSYCAM_IMU_TRACE")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, 0 = as fast as possible")
+    parser.add_argument("--all", action="store_true", help="print every sample, not just state changes")
+    parser.add_argument("--expect-moving", metavar="START:END",
+                        help="exit 1 if any sample between these offsets (s) reads STATIONARY")
+    parser.add_argument("--check-append", action="store_true",
+                        help="check that appending to a trace with a torn last record reads back intact")
+    args = parser.parse_args(argv)
+
+    if args.check_append:
+        problems = check_append()
+        for problem in problems:
+            print("FAIL:", problem, file=sys.stderr)
+        if not problems:
+            print("OK: torn record cut off, second run appended as its own segment", file=sys.stderr)
+        return 1 if problems else 0
+    if not args.trace:
+        parser.error("a trace file is required")
+
+    with TraceReader(args.trace) as trace:
+        if not len(trace):
+            print("Empty trace.", file=sys.stderr)
+            return 1
+        start = time.perf_counter()
+        states = replay_trace(trace, args.speed)
+        elapsed = time.perf_counter() - start
+
+        t0 = states[0][0]
+        last = None
+        for t, status, speed_kph in states:
+            if args.all or status != last:
+                print(f"{t - t0:9.3f}s  {status:<14} {speed_kph:6.1f} kph")
+            last = status
+        print(f"{len(states)} samples ({trace.duration:.1f}s recorded) in {elapsed:.2f}s "
+              f"= {len(states) / elapsed:.0f} samples/s", file=sys.stderr)
+
+        if args.expect_moving:
+            start, end = (float(v) for v in args.expect_moving.split(":"))
+            stopped = [t - t0 for t, status, _ in states if start <= t - t0 <= end and status == "STATIONARY"]
+            if stopped:
+                print(f"FAIL: STATIONARY at {len(stopped)} samples between {start}s and {end}s "
+                      f"(first at {stopped[0]:.3f}s)", file=sys.stderr)
+                return 1
+            print(f"OK: moving throughout {start}s - {end}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import multiprocessing as mp
+import queue
+
+from frame_ring import FrameRing
+
+WORKER_READER = 1  # Reader id the worker uses on the capture ring
+
+
+def _inference_worker(ring_spec, max_faces, requests, results):
+    """Runs in the child process: face mesh on frames read in place from the capture ring."""
+    from cvzone.FaceMeshModule import FaceMeshDetector
+
+    ring = FrameRing.attach(ring_spec)
+    detector = FaceMeshDetector(maxFaces=max_faces)
+
+    try:
+        while True:
+            req = requests.get()
+            if req is None:
+                break
+            slot, seq, timestamp = req
+            faces = None
+            try:
+                if ring.valid(slot, seq):
+                    _, faces = detector.findFaceMesh(ring.frames[slot], draw=False)
+            except Exception as e:
+                print("Inference worker error:", e)
+            finally:
+                ring.unpin(slot, WORKER_READER)
+            results.put((seq, timestamp, faces))
+    finally:
+        ring.close()
+
+
+class InferencePipeline:
+    """Face-mesh inference in a separate process.
+
+    The worker attaches to the capture FrameRing and reads pinned slots in
+    place: only (slot, seq, timestamp) goes through the request queue and only
+    the landmark lists come back. The Tk process keeps rule evaluation and
+    drawing. Submissions are dropped while max_in_flight frames are queued,
+    so the worker always works on a recent frame.
+    """
+
+    def __init__(self, max_faces=1, max_in_flight=2):
+        self.max_faces = max_faces
+        self.max_in_flight = max_in_flight
+        self.ctx = mp.get_context("spawn")  # Never fork a process running Tk/camera threads
+        self.process = None
+        self.ring = None
+        self.requests = None
+        self.results = None
+        self.in_flight = 0
+
+        self.submitted = 0
+        self.skipped = 0
+
+    def start(self, ring):
+        self.stop()
+        self.ring = ring
+        self.in_flight = 0
+        self.requests = self.ctx.Queue()
+        self.results = self.ctx.Queue()
+        self.process = self.ctx.Process(
+            target=_inference_worker,
+            args=(ring.spec(), self.max_faces, self.requests, self.results),
+            daemon=True,
+        )
+        self.process.start()
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def crashed(self):
+        """True once a started worker has died; callers fall back to in-process inference."""
+        return self.process is not None and not self.process.is_alive()
+
+    def submit(self, ring, seq, timestamp):
+        """Hands the frame committed as seq to the worker. Returns False if it was skipped."""
+        if ring is not self.ring:
+            self.start(ring)
+
+        if not self.alive() or self.in_flight >= self.max_in_flight:
+            self.skipped += 1
+            return False
+
+        slot = ring.pin(seq, WORKER_READER)
+        if slot is None:
+            self.skipped += 1
+            return False
+
+        self.requests.put((slot, seq, timestamp))
+        self.in_flight += 1
+        self.submitted += 1
+        return True
+
+    def poll(self):
+        """ Returns: (seq, timestamp, faces) for the newest finished frame, or None """
+        if self.results is None:
+            return None
+
+        newest = None
+        while True:
+            try:
+                seq, timestamp, faces = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.in_flight -= 1
+            if faces is not None:  # None = frame was overwritten before inference
+                newest = (seq, timestamp, faces)
+        return newest
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.requests.put(None)
+                self.process.join(timeout=1)
+                if self.process.is_alive():
+                    self.process.terminate()
+                    self.process.join(timeout=1)
+            except Exception:
+                pass
+            if self.ring is not None and not self.process.is_alive():
+                # Requests it never answered leave their slots pinned; the ring outlives the worker
+                self.ring.unpin_all(WORKER_READER)
+            self.process = None
+        self.ring = None
+        self.in_flight = 0
@@ -0,0 +1,178 @@
+import struct
+import threading
+import time
+
+from vehicle_estimator import VehicleEstimator
+
+# --- MPU6050/9250 REGISTERS ---
+MPU_ADDRESS = 0x68
+PWR_MGMT_1 = 0x6B
+ACCEL_XOUT_H = 0x3B  # Start of ACCEL_XYZ, TEMP, GYRO_XYZ: 7 big-endian int16
+BLOCK_LENGTH = 14
+ACCEL_SCALE = 16384.0  # LSB per g at +-2 g
+GYRO_SCALE = 131.0  # LSB per deg/s at +-250 deg/s
+
+_BLOCK = struct.Struct(">7h")
+
+
+def open_bus(bus_id=1):
+    import smbus
+    return smbus.SMBus(bus_id)
+
+
+# --- MPU6050/9250 VEHICLE DYNAMICS CLASS ---
+class MPU_Sensor:
+    """Vehicle state (stationary / driving / turning) and speed from the MPU.
+
+    Every sample goes through a VehicleEstimator (bias calibration, gravity
+    removal, zero-velocity updates); keep the car parked for the first
+    couple of seconds after start so the calibration sees it at rest.
+
+    bus: anything with the smbus methods used here (write_byte_data,
+    read_byte_data, read_i2c_block_data); defaults to I2C bus 1. Without a
+    working sensor it runs in simulation mode (always DRIVING at 65 kph).
+    clock: sample timestamps (a replayed trace passes its recorded time).
+    """
+
+    def __init__(self, address=MPU_ADDRESS, bus=None, clock=time.monotonic):
+        self.address = address
+        self.clock = clock
+        self.connected = False
+        self.estimator = VehicleEstimator()
+
+        try:
+            self.bus = bus if bus is not None else open_bus()
+            # Wake up MPU
+            self.bus.write_byte_data(self.address, PWR_MGMT_1, 0)
+            self.connected = True
+            print("MPU Connected: Vehicle Dynamics Active")
+        except Exception:
+            print("MPU Not Found: Vehicle Logic Disabled")
+
+    def read_sample(self):
+        """One burst read of all accel/gyro registers.
+
+        Returns: ax, ay, az (g), gx, gy, gz (deg/s)
+        """
+        data = self.bus.read_i2c_block_data(self.address, ACCEL_XOUT_H, BLOCK_LENGTH)
+        ax, ay, az, _, gx, gy, gz = _BLOCK.unpack(bytes(data))
+        return (ax / ACCEL_SCALE, ay / ACCEL_SCALE, az / ACCEL_SCALE,
+                gx / GYRO_SCALE, gy / GYRO_SCALE, gz / GYRO_SCALE)
+
+    def update(self, sample, now):
+        """Advances the vehicle model by one sample. Returns: status_string, speed_kph"""
+        return self.estimator.update(sample, now)
+
+    def get_vehicle_status(self):
+        """ Returns: status_string, speed_kph """
+        # --- SIMULATION MODE ---
+        if not self.connected:
+            return "DRIVING", 65.0
+
+        # --- REAL SENSOR MODE ---
+        try:
+            return self.update(self.read_sample(), self.clock())
+        except Exception:
+            return "ERROR", 0
+
+
+class ImuSampler:
+    """Samples an MPU_Sensor on its own thread at a fixed rate.
+
+    The vehicle model integrates every sample, independent of the video
+    frame rate, and I2C latency stays off the Tk thread. The latest
+    (status, speed, timestamp) is published as one tuple, so readers never
+    see a half-updated state. get_vehicle_status() has the same signature
+    as the sensor's, so the frame loop can use either.
+    """
+
+    def __init__(self, sensor, rate_hz=200):
+        self.sensor = sensor
+        self.period = 1.0 / rate_hz
+        self.state = ("STATIONARY", 0, None)
+        self.running = False
+        self.thread = None
+
+        # Counters
+        self.samples = 0
+        self.errors = 0
+        self.overruns = 0  # Periods missed because a read or the scheduler ran late
+
+    def start(self):
+        if not self.sensor.connected:
+            return  # Simulation mode: nothing to sample
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=1)
+        self.thread = None
+
+    def _sample_loop(self):
+        next_t = time.monotonic()
+        while self.running:
+            status, speed = self.sensor.get_vehicle_status()
+            now = time.monotonic()
+            self.state = (status, speed, now)
+            self.samples += 1
+            if status == "ERROR":
+                self.errors += 1
+
+            next_t += self.period
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.period:
+                self.overruns += 1
+                next_t = time.monotonic()  # Don't try to catch up with a burst of reads
+
+    def get_vehicle_status(self):
+        """ Returns: status_string, speed_kph of the newest sample """
+        if self.thread is None:
+            return self.sensor.get_vehicle_status()
+        status, speed, _ = self.state
+        return status, speed
+
+
+class FakeSMBus:
+    """In-memory stand-in for smbus.SMBus with an MPU register file, for running without the Pi.
+
+        bus = FakeSMBus()
+        bus.set_motion(acc_y=0.2)  # 0.2 g forward
+        sensor = MPU_Sensor(bus=bus)
+    """
+
+    def __init__(self, address=MPU_ADDRESS):
+        self.address = address
+        self.registers = bytearray(128)
+        self.block_reads = 0
+        self.byte_reads = 0
+
+    def set_motion(self, acc_x=0.0, acc_y=0.0, acc_z=1.0, gyro_x=0.0, gyro_y=0.0, gyro_z=0.0):
+        values = [acc_x * ACCEL_SCALE, acc_y * ACCEL_SCALE, acc_z * ACCEL_SCALE, 0,
+                  gyro_x * GYRO_SCALE, gyro_y * GYRO_SCALE, gyro_z * GYRO_SCALE]
+        values = [max(-32768, min(32767, int(round(v)))) for v in values]
+        self.registers[ACCEL_XOUT_H:ACCEL_XOUT_H + BLOCK_LENGTH] = _BLOCK.pack(*values)
+
+    def _check(self, addr):
+        if addr != self.address:
+            raise OSError(121, "Remote I/O error")
+
+    def write_byte_data(self, addr, register, value):
+        self._check(addr)
+        self.registers[register] = value & 0xFF
+
+    def read_byte_data(self, addr, register):
+        self._check(addr)
+        self.byte_reads += 1
+        return self.registers[register]
+
+    def read_i2c_block_data(self, addr, register, length):
+        self._check(addr)
+        self.block_reads += 1
+        return list(self.registers[register:register + length])
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+import cv2
+
+from driver_store import DEFAULT_DB, DriverStore
+from drowsiness_engine import MAX_SAMPLE_GAP, DrowsinessEngine
+from eye_metrics import DEFAULT_RATIO_SOURCE, RATIO_SOURCES, batch_ratios
+from session_recorder import SESSION_EXTENSION, SessionReader
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".h264", ".mjpeg")
+CSV_FIELDS = ["file", "frame", "t", "face", "raw", "ear", "status", "events"]
+BATCH_FRAMES = 256  # Eye ratios are computed for this many frames at once
+DEFAULT_PROFILE = (30.0, 20.0, 40.0)  # threshold, closed_eye, open_eye
+
+
+def _profile_values(filename):
+    values = {}
+    with open(filename, "r") as f:
+        for line in f:
+            if line.startswith("--- HISTORY ---"):
+                break
+            if ":" in line:
+                key, val = line.split(":", 1)
+                values[key.strip()] = val.strip()
+    return values
+
+
+def read_profile(filename):
+    """ Returns: threshold, closed_eye, open_eye from a driver .txt profile """
+    values = _profile_values(filename)
+    return float(values["Threshold"]), float(values["ClosedEye"]), float(values["OpenEye"])
+
+
+def read_ratio_source(filename):
+    """ Returns: the eye ratio a profile was calibrated with (older profiles: the lid ratio) """
+    return _profile_values(filename).get("RatioSource", DEFAULT_RATIO_SOURCE)
+
+
+def find_videos(paths, extensions=VIDEO_EXTENSIONS):
+    videos = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                videos += [os.path.join(root, f) for f in files if f.lower().endswith(extensions)]
+        else:
+            videos.append(p)
+    return sorted(videos)
+
+
+def _run_rules(engine, summary, path, rows, samples):
+    """Feeds samples (frame, t, raw ratio or None, vehicle_state) to the engine, updating summary / rows."""
+    for index, t, raw, vehicle_state in samples:
+        ear = None
+        events = []
+        if raw is not None:
+            summary["faces"] += 1
+            events = engine.update(t, raw, vehicle_state)
+            ear = engine.ear
+
+        for ev in events:
+            if ev.kind == "WARNING":
+                summary["warnings"] += 1
+            elif ev.kind == "ALARM":
+                summary["alarms"] += 1
+                summary["alarm_reasons"][ev.reason] = summary["alarm_reasons"].get(ev.reason, 0) + 1
+                engine.acknowledge(t)  # Nobody presses STOP offline; resume detection
+
+        if rows is not None:
+            rows.writerow({
+                "file": path,
+                "frame": index,
+                "t": f"{t:.3f}",
+                "face": 0 if raw is None else 1,
+                "raw": "" if raw is None else f"{raw:.3f}",
+                "ear": "" if ear is None else f"{ear:.3f}",
+                "status": engine.status,
+                "events": ";".join(f"{ev.kind}:{ev.reason}" if ev.reason else ev.kind for ev in events),
+            })
+
+
+def _finish_summary(summary, engine):
+    summary["blinks"] = engine.total_blinks
+    minutes = summary["video_seconds"] / 60
+    summary["blinks_per_min"] = summary["blinks"] / minutes if minutes else 0.0
+    # PERCLOS as the car measures it: raw ratio at or below the P80 level, time weighted,
+    # over the time the face was observed with the rules running
+    summary["observed_seconds"] = engine.total_observed
+    summary["closed_seconds"] = engine.total_closed
+    summary["perclos"] = engine.total_closed / engine.total_observed if engine.total_observed else 0.0
+    return summary
+
+
+def replay_video(path, detector, profile, vehicle_state="DRIVING", rows=None, ratio_source=DEFAULT_RATIO_SOURCE):
+    """Runs one video through the pipeline as fast as possible.
+
+    profile: (threshold, closed_eye, open_eye). rows: optional csv.DictWriter.
+    Landmarks are collected for BATCH_FRAMES frames and their eye ratios
+    computed in one vectorised call before the rules run over them in order.
+    Returns: summary dict for the clip.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps != fps or fps > 1000:
+        fps = 30.0
+
+    ids = RATIO_SOURCES[ratio_source]
+    engine = DrowsinessEngine(*profile)
+    summary = {"file": path, "frames": 0, "faces": 0, "video_seconds": 0.0,
+               "warnings": 0, "alarms": 0, "alarm_reasons": {}}
+
+    def run_rules(pending):
+        with_face = [p for _, p in pending if p is not None]
+        ratios = iter(batch_ratios(with_face, ratio_source).tolist() if with_face else [])
+        # Video time drives the rules, not wall time
+        _run_rules(engine, summary, path, rows, ((index, index / fps, None if points is None else next(ratios),
+                                                  vehicle_state) for index, points in pending))
+
+    started = time.perf_counter()
+    frame = None
+    pending = []  # (frame index, eye landmark coordinates or None)
+    while True:
+        ret, frame = cap.read(frame)  # Reuse the decode buffer
+        if ret:
+            _, faces = detector.findFaceMesh(frame, draw=False)
+            pending.append((summary["frames"], [faces[0][i][:2] for i in ids] if faces else None))
+            summary["frames"] += 1
+        if pending and (not ret or len(pending) >= BATCH_FRAMES):
+            run_rules(pending)
+            pending = []
+        if not ret:
+            break
+
+    cap.release()
+    elapsed = time.perf_counter() - started
+    summary["video_seconds"] = summary["frames"] / fps
+    summary["elapsed"] = elapsed
+    summary["fps"] = summary["frames"] / elapsed if elapsed > 0 else 0.0
+    return _finish_summary(summary, engine)
+
+
+def replay_session(path, profile=None, vehicle_state=None, rows=None, ratio_source=None):
+    """Runs a SessionRecorder file through the rules, without a face mesh.
+
+    Eye ratios are recomputed from the recorded landmarks and the rules run
+    on the recorded capture times. profile / ratio_source default to the
+    ones the session was recorded with; vehicle_state=None uses the
+    recorded state of every frame. Returns: summary dict for the session.
+    """
+    started = time.perf_counter()
+    session = SessionReader(path)
+    meta = session.meta
+    if profile is None:
+        profile = (meta["threshold"], meta["closed_eye"], meta["open_eye"])
+    ratio_source = ratio_source or meta.get("ratio_source", DEFAULT_RATIO_SOURCE)
+
+    engine = DrowsinessEngine(*profile)
+    summary = {"file": path, "frames": len(session), "faces": 0, "video_seconds": 0.0,
+               "warnings": 0, "alarms": 0, "alarm_reasons": {}}
+
+    t = session.columns["t"].tolist()
+    face = session.columns["face"].astype(bool)
+    ratios = batch_ratios(session.ratio_points(ratio_source), ratio_source)
+    ratios = [r if f and r == r else None for f, r in zip(face.tolist(), ratios.tolist())]  # NaN: id not tracked
+    states = session.vehicle_states() if vehicle_state is None else [vehicle_state] * len(t)
+    dts = [0.0] + [min(b - a, MAX_SAMPLE_GAP) for a, b in zip(t, t[1:])]
+
+    _run_rules(engine, summary, path, rows, zip(range(len(t)), t, ratios, states))
+
+    elapsed = time.perf_counter() - started
+    summary["video_seconds"] = sum(dts)
+    summary["recorded_alarms"] = int(((session.columns["events"] & meta["event_bits"]["ALARM"]) != 0).sum())
+    summary["elapsed"] = elapsed
+    summary["fps"] = summary["frames"] / elapsed if elapsed > 0 else 0.0
+    return _finish_summary(summary, engine)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded video through the DrowsyCam detector.")
+    parser.add_argument("inputs", nargs="+", help="video files, session recordings (.dcs) and/or directories")
+    parser.add_argument("-o", "--output", help="per-frame CSV (default: stdout)")
+    parser.add_argument("--profile", help="driver profile .txt to take thresholds from")
+    parser.add_argument("--driver", help="driver in the database to take thresholds from (newest calibration)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="DrowsyCam database for --driver")
+    parser.add_argument("--threshold", type=float)
+    parser.add_argument("--closed-eye", type=float)
+    parser.add_argument("--open-eye", type=float)
+    parser.add_argument("--vehicle-state",
+                        help="state fed to the rules for every frame (default: DRIVING, sessions: as recorded)")
+    parser.add_argument("--ratio-source", choices=sorted(RATIO_SOURCES),
+                        help="eye ratio to compute (default: the profile's / session's, else lid)")
+    args = parser.parse_args(argv)
+
+    # Sessions keep their recorded profile unless one is given
+    given = (args.threshold, args.closed_eye, args.open_eye)
+    driver = None
+    if args.driver:
+        driver = DriverStore(args.db).driver(args.driver)
+        if driver is None:
+            print(f"No driver named {args.driver!r} in {args.db}.", file=sys.stderr)
+            return 1
+    if driver:
+        open_eye, closed_eye, threshold, _ = driver
+        session_profile = profile = (threshold, closed_eye, open_eye)
+    elif args.profile:
+        session_profile = profile = read_profile(args.profile)
+    elif any(v is not None for v in given):
+        session_profile = profile = tuple(d if v is None else v for v, d in zip(given, DEFAULT_PROFILE))
+    else:
+        session_profile, profile = None, DEFAULT_PROFILE
+    session_source = args.ratio_source or (driver[3] if driver else None) or \
+        (read_ratio_source(args.profile) if args.profile else None)
+    ratio_source = session_source or DEFAULT_RATIO_SOURCE
+
+    videos = find_videos(args.inputs, VIDEO_EXTENSIONS + (SESSION_EXTENSION,))
+    if not videos:
+        print("No videos found.", file=sys.stderr)
+        return 1
+
+    detector = None
+    if not all(v.endswith(SESSION_EXTENSION) for v in videos):
+        from cvzone.FaceMeshModule import FaceMeshDetector
+        detector = FaceMeshDetector(maxFaces=1)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    rows = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    rows.writeheader()
+
+    total_frames = 0
+    total_elapsed = 0.0
+    try:
+        for path in videos:
+            try:
+                if path.endswith(SESSION_EXTENSION):
+                    s = replay_session(path, session_profile, args.vehicle_state, rows, session_source)
+                else:
+                    s = replay_video(path, detector, profile, args.vehicle_state or "DRIVING", rows, ratio_source)
+            except IOError as e:
+                print(e, file=sys.stderr)
+                continue
+            total_frames += s["frames"]
+            total_elapsed += s["elapsed"]
+            print(f"{path}: {s['frames']} frames ({s['video_seconds']:.1f}s video) in {s['elapsed']:.2f}s "
+                  f"= {s['fps']:.1f} fps | warnings {s['warnings']} alarms {s['alarms']}", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if total_elapsed > 0:
+        print(f"TOTAL: {total_frames} frames in {total_elapsed:.2f}s = {total_frames / total_elapsed:.1f} fps",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
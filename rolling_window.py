@@ -0,0 +1,104 @@
+import math
+from collections import deque
+
+
+class RollingWindow:
+    """Count / sum / mean / min / max of timestamped samples over the last `seconds`.
+
+    Samples live in a deque next to a running sum, and min/max come from
+    monotonic deques, so add() and expire() are amortised O(1) and every
+    statistic is O(1) to read - nothing rescans the window per frame.
+    A sample at time t stays in the window while now - t <= seconds.
+
+        blinks = RollingWindow(60)
+        blinks.add(now, duration)      # one sample per blink
+        blinks.count, blinks.mean      # blinks in the last minute, mean duration
+
+        closed = RollingWindow(60)
+        closed.add(now, 1 if eyes_closed else 0)
+        closed.mean                    # fraction of samples with the eyes closed
+    """
+
+    def __init__(self, seconds, extremes=False):
+        self.seconds = seconds
+        self.extremes = extremes
+        self.samples = deque()  # (t, value)
+        self.total = 0.0
+        self._min = deque()  # (t, value), values increasing
+        self._max = deque()  # (t, value), values decreasing
+
+    def clear(self):
+        self.samples.clear()
+        self._min.clear()
+        self._max.clear()
+        self.total = 0.0
+
+    def add(self, t, value=1.0):
+        self.samples.append((t, value))
+        self.total += value
+        if self.extremes:
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((t, value))
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((t, value))
+        self.expire(t)
+
+    def expire(self, now):
+        """Drops samples that fell out of the window at time `now`."""
+        samples = self.samples
+        while samples and now - samples[0][0] > self.seconds:
+            self.total -= samples.popleft()[1]
+        if not samples:
+            self.total = 0.0  # Don't let float error build up across empty windows
+        while self._min and now - self._min[0][0] > self.seconds:
+            self._min.popleft()
+        while self._max and now - self._max[0][0] > self.seconds:
+            self._max.popleft()
+
+    @property
+    def count(self):
+        return len(self.samples)
+
+    @property
+    def mean(self):
+        return self.total / len(self.samples) if self.samples else 0.0
+
+    @property
+    def min(self):
+        """ Returns: smallest value in the window, None if empty (needs extremes=True) """
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        """ Returns: largest value in the window, None if empty (needs extremes=True) """
+        return self._max[0][1] if self._max else None
+
+
+class TimeEma:
+    """Exponential moving average with a time constant instead of a sample count.
+
+    Each sample is weighted by 1 - exp(-dt / tau), so the smoothing delay is
+    about `tau` seconds whatever the frame rate. The first sample (and the
+    first after reset()) is taken as is.
+    """
+
+    def __init__(self, tau):
+        self.tau = tau
+        self.value = None
+        self.t = None
+
+    def reset(self):
+        self.value = None
+        self.t = None
+
+    def update(self, t, x):
+        """ Returns: the smoothed value after adding x at time t """
+        if self.value is None or self.tau <= 0:
+            self.value = x
+        else:
+            alpha = 1.0 - math.exp(-max(t - self.t, 0.0) / self.tau)
+            self.value += alpha * (x - self.value)
+        self.t = t
+        return self.value
@@ -0,0 +1,244 @@
+import json
+import queue
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from drowsiness_engine import ALARM, NORMAL, PRE_WARNING
+from eye_metrics import EAR_LANDMARKS, EYE_LANDMARKS, RATIO_SOURCES
+
+# --- FILE FORMAT ---
+# Header: magic, length of the JSON metadata that follows (columns, landmark ids, profile...).
+# Then chunks: CHUNK header (tag, rows), followed by each column of the chunk in COLUMNS
+# order as one contiguous little-endian array. A torn chunk at the end is ignored.
+MAGIC = b"DCSESS01"
+HEADER = struct.Struct("<8sI")
+CHUNK = struct.Struct("<4sI")
+CHUNK_TAG = b"CHNK"
+CHUNK_ROWS = 256  # Rows buffered in memory before a chunk is handed to the writer thread
+SESSION_EXTENSION = ".dcs"
+
+# Every landmark either ratio source needs, so a session replays with lid or ear
+LANDMARK_IDS = tuple(dict.fromkeys(EYE_LANDMARKS + EAR_LANDMARKS))
+VEHICLE_STATES = ("STATIONARY", "DRIVING", "ACCELERATING", "TURNING LEFT", "TURNING RIGHT", "ERROR")
+ENGINE_STATES = (NORMAL, PRE_WARNING, ALARM)
+EVENT_BITS = {"WARNING": 1, "COUNTDOWN": 2, "ALARM": 4, "RESET": 8}
+UNKNOWN = 255
+
+COLUMNS = (  # name, dtype, per-row shape
+    ("t", "<f8", ()),  # Capture timestamp (monotonic seconds)
+    ("seq", "<i8", ()),  # Camera frame sequence number
+    ("face", "u1", ()),
+    ("landmarks", "<f4", (len(LANDMARK_IDS), 2)),  # Pixel coordinates, NaN without a face
+    ("raw", "<f4", ()),  # Eye ratio fed to the rules, NaN without a face
+    ("ear", "<f4", ()),  # Smoothed ratio after the update
+    ("vehicle", "u1", ()),  # Index into VEHICLE_STATES
+    ("speed", "<f4", ()),
+    ("status", "u1", ()),  # Index into ENGINE_STATES after the update
+    ("events", "u1", ()),  # EVENT_BITS of the engine events since the previous row
+    ("video_frame", "<i4", ()),  # Frame number in the session video, -1 if not written
+)
+
+
+def _landmarks(face):
+    """Recorded ids of a face; a tracked face (a dict of the tracked ids) leaves the rest NaN."""
+    if isinstance(face, dict):
+        return [face[k][:2] if k in face else (np.nan, np.nan) for k in LANDMARK_IDS]
+    return [face[k][:2] for k in LANDMARK_IDS]
+
+
+def _code(table, value):
+    try:
+        return table.index(value)
+    except ValueError:
+        return UNKNOWN
+
+
+class SessionRecorder:
+    """Records what the operation screen's detector saw, one row per processed frame.
+
+    Rows are buffered in preallocated column arrays; every CHUNK_ROWS rows
+    the chunk goes to a writer thread, which also encodes the optional
+    downsampled video. The frame loop only ever copies a few numbers (and
+    a small resized frame when video is on) - if the writer falls behind,
+    video frames are dropped, never rows.
+
+        recorder = SessionRecorder("drive.dcs", meta={"threshold": 30.0, ...}, video_path="drive.avi")
+        engine.subscribe(recorder.on_event)
+        recorder.record(frame_ts, seq, face, raw, engine.ear, v_state, v_speed, engine.status, frame)
+        recorder.close()
+    """
+
+    def __init__(self, path, meta=None, video_path=None, video_fps=10.0, video_scale=0.5, max_queue=8):
+        self.path = path
+        self.video_path = video_path
+        self.video_interval = 1.0 / video_fps if video_fps else 0.0
+        self.video_fps = video_fps
+        self.video_scale = video_scale
+        self.max_queue = max_queue
+
+        header = dict(meta or {})
+        header.update({
+            "columns": [[name, dtype, list(shape)] for name, dtype, shape in COLUMNS],
+            "landmark_ids": list(LANDMARK_IDS),
+            "vehicle_states": list(VEHICLE_STATES),
+            "engine_states": list(ENGINE_STATES),
+            "event_bits": EVENT_BITS,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "video": video_path,
+        })
+        blob = json.dumps(header).encode()
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, len(blob)))
+        self.f.write(blob)
+
+        self.columns = {name: np.empty((CHUNK_ROWS,) + shape, dtype=dtype) for name, dtype, shape in COLUMNS}
+        self.rows = 0
+        self.pending_events = 0
+        self.video = None
+        self.video_frames = 0
+        self.last_video_t = None
+
+        # Counters
+        self.total_rows = 0
+        self.chunks = 0
+        self.video_dropped = 0
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def on_event(self, ev):
+        """Engine subscriber: the event goes on the next recorded row."""
+        self.pending_events |= EVENT_BITS.get(ev.kind, 0)
+
+    def record(self, t, seq, face, raw, ear, vehicle_state, speed, status, frame=None):
+        i = self.rows
+        c = self.columns
+        c["t"][i] = t
+        c["seq"][i] = seq
+        if face:
+            c["face"][i] = 1
+            c["landmarks"][i] = _landmarks(face)
+            c["raw"][i] = raw
+        else:
+            c["face"][i] = 0
+            c["landmarks"][i] = np.nan
+            c["raw"][i] = np.nan
+        c["ear"][i] = ear
+        c["vehicle"][i] = _code(VEHICLE_STATES, vehicle_state)
+        c["speed"][i] = speed
+        c["status"][i] = _code(ENGINE_STATES, status)
+        c["events"][i] = self.pending_events
+        self.pending_events = 0
+        c["video_frame"][i] = self._queue_video(t, frame)
+
+        self.rows += 1
+        self.total_rows += 1
+        if self.rows == CHUNK_ROWS:
+            self.flush()
+
+    def _queue_video(self, t, frame):
+        if self.video_path is None or frame is None:
+            return -1
+        if self.last_video_t is not None and t - self.last_video_t < self.video_interval:
+            return -1
+        self.last_video_t = t
+        if self.queue.qsize() >= self.max_queue:
+            self.video_dropped += 1
+            return -1
+        # The resize is the copy: the camera slot is reused as soon as the loop moves on
+        small = cv2.resize(frame, None, fx=self.video_scale, fy=self.video_scale, interpolation=cv2.INTER_AREA)
+        index = self.video_frames
+        self.video_frames += 1
+        self.queue.put(("frame", small))
+        return index
+
+    def flush(self):
+        """Hands the buffered rows to the writer thread as one chunk."""
+        if not self.rows:
+            return
+        chunk = [self.columns[name][:self.rows].copy() for name, _, _ in COLUMNS]
+        self.queue.put(("chunk", (self.rows, chunk)))
+        self.rows = 0
+        self.chunks += 1
+
+    def _write_loop(self):
+        while True:
+            kind, item = self.queue.get()
+            if kind == "stop":
+                break
+            if kind == "chunk":
+                rows, chunk = item
+                self.f.write(CHUNK.pack(CHUNK_TAG, rows))
+                for column in chunk:
+                    self.f.write(column.tobytes())
+            elif kind == "frame":
+                if self.video is None:
+                    h, w = item.shape[:2]
+                    self.video = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*"MJPG"),
+                                                 self.video_fps or 30.0, (w, h))
+                self.video.write(item)
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.flush()
+        self.queue.put(("stop", None))
+        self.thread.join()
+        self.thread = None
+        if self.video is not None:
+            self.video.release()
+        self.f.close()
+
+
+class SessionReader:
+    """Loads a session file written by SessionRecorder.
+
+        session = SessionReader("drive.dcs")
+        session.meta["threshold"], len(session)
+        session.columns["t"], session.columns["raw"], ...
+        session.ratio_points("ear")  # (n, k, 2) landmarks in RATIO_SOURCES["ear"] order
+        session.vehicle_states()     # list of state strings
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, meta_len = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise IOError(f"{path}: not a session recording")
+        off = HEADER.size
+        self.meta = json.loads(data[off:off + meta_len].decode())
+        off += meta_len
+
+        layout = [(name, np.dtype(dtype), tuple(shape)) for name, dtype, shape in self.meta["columns"]]
+        parts = {name: [] for name, _, _ in layout}
+        while off + CHUNK.size <= len(data):
+            tag, rows = CHUNK.unpack_from(data, off)
+            size = sum(rows * dtype.itemsize * int(np.prod(shape)) for _, dtype, shape in layout)
+            if tag != CHUNK_TAG or off + CHUNK.size + size > len(data):
+                break  # Torn chunk from an interrupted recording
+            off += CHUNK.size
+            for name, dtype, shape in layout:
+                n = rows * int(np.prod(shape))
+                parts[name].append(np.frombuffer(data, dtype=dtype, count=n, offset=off).reshape((rows,) + shape))
+                off += n * dtype.itemsize
+
+        self.columns = {name: np.concatenate(parts[name]) if parts[name] else np.zeros((0,) + shape, dtype=dtype)
+                        for name, dtype, shape in layout}
+
+    def __len__(self):
+        return len(self.columns["t"])
+
+    def ratio_points(self, source):
+        index = {k: i for i, k in enumerate(self.meta["landmark_ids"])}
+        return self.columns["landmarks"][:, [index[k] for k in RATIO_SOURCES[source]]]
+
+    def vehicle_states(self):
+        table = self.meta["vehicle_states"]
+        return [table[c] if c < len(table) else "UNKNOWN" for c in self.columns["vehicle"].tolist()]
@@ -0,0 +1,78 @@
+import tkinter as tk
+
+
+class Sparkline(tk.Canvas):
+    """Live line graph drawn with a single Canvas polyline.
+
+    set_data() only moves the existing line's points (coords update), so a
+    frame costs one Tk call instead of a matplotlib redraw. Horizontal
+    threshold lines are separate items that only move when their value or
+    the widget size changes.
+    """
+
+    def __init__(self, master, maxlen=50, ymin=10, ymax=60, color="#4daff7", width=300, height=150, **kwargs):
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(master, width=width, height=height, **kwargs)
+        self.maxlen = maxlen
+        self.ymin = ymin
+        self.ymax = ymax
+        self.w = width
+        self.h = height
+        self.values = []
+        self.thresholds = {}  # name -> (item, value)
+
+        self.line = self.create_line(0, 0, 0, 0, fill=color, width=2, state="hidden")
+        self.visible = False
+        self.coords_buf = [0.0] * (2 * maxlen)
+        self._layout_x()
+        self.bind("<Configure>", self._on_resize)
+
+    def _layout_x(self):
+        step = self.w / max(self.maxlen - 1, 1)
+        for i in range(self.maxlen):
+            self.coords_buf[2 * i] = i * step
+
+    def _y(self, v):
+        v = min(max(v, self.ymin), self.ymax)
+        return self.h - (v - self.ymin) / (self.ymax - self.ymin) * self.h
+
+    def _on_resize(self, event):
+        if event.width == self.w and event.height == self.h:
+            return
+        self.w, self.h = event.width, event.height
+        self._layout_x()
+        for name, (_, value) in list(self.thresholds.items()):
+            self._place_threshold(name, value)
+        self.set_data(self.values)
+
+    def set_data(self, values):
+        """Redraws the line from the newest maxlen values (e.g. a deque(maxlen=...))."""
+        self.values = values
+        n = min(len(values), self.maxlen)
+        if n < 2:
+            if self.visible:
+                self.itemconfigure(self.line, state="hidden")
+                self.visible = False
+            return
+
+        buf = self.coords_buf
+        start = len(values) - n
+        for i in range(n):
+            buf[2 * i + 1] = self._y(values[start + i])
+        self.coords(self.line, buf[:2 * n])
+        if not self.visible:
+            self.itemconfigure(self.line, state="normal")
+            self.visible = True
+
+    def set_threshold(self, name, value, color="#636e72", dash=(4, 2)):
+        if name not in self.thresholds:
+            item = self.create_line(0, 0, 0, 0, fill=color, dash=dash)
+            self.tag_lower(item, self.line)
+            self.thresholds[name] = (item, value)
+        self._place_threshold(name, value)
+
+    def _place_threshold(self, name, value):
+        item, _ = self.thresholds[name]
+        y = self._y(value)
+        self.coords(item, 0, y, self.w, y)
+        self.thresholds[name] = (item, value)
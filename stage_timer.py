@@ -0,0 +1,79 @@
+import time
+from array import array
+
+
+class StageTimer:
+    """Always-on per-stage timings for the frame loop.
+
+    Each stage keeps its last `size` durations in a preallocated ring
+    (array of doubles), so recording is a clock read and one store.
+    Percentiles are only computed when someone asks (overlay / log line).
+
+        t = perf.now()
+        ... capture ...
+        t = perf.lap("capture", t)
+        ... inference ...
+        t = perf.lap("inference", t)
+    """
+
+    def __init__(self, stages, size=256):
+        self.stages = list(stages)
+        self.size = size
+        self.buffers = {name: array("d", bytes(8 * size)) for name in self.stages}
+        self.index = {name: 0 for name in self.stages}
+        self.count = {name: 0 for name in self.stages}
+        self.counters = {}
+        self.last_log = time.monotonic()
+
+    now = staticmethod(time.perf_counter)
+
+    def record(self, name, seconds):
+        i = self.index[name]
+        self.buffers[name][i] = seconds
+        self.index[name] = (i + 1) % self.size
+        self.count[name] += 1
+
+    def lap(self, name, t0):
+        """Records now - t0 under name. Returns: now (start of the next stage)."""
+        t = time.perf_counter()
+        self.record(name, t - t0)
+        return t
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def stats(self, name):
+        """ Returns: (p50_ms, p99_ms, max_ms) over the rolling window, or None if empty """
+        n = min(self.count[name], self.size)
+        if n == 0:
+            return None
+        values = sorted(self.buffers[name][:n])
+        return (1000 * values[n // 2],
+                1000 * values[min(n - 1, int(n * 0.99))],
+                1000 * values[-1])
+
+    def report_lines(self):
+        lines = []
+        for name in self.stages:
+            s = self.stats(name)
+            if s:
+                lines.append(f"{name:<10}{s[0]:6.1f}{s[1]:7.1f} ms")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<10}{value:>13}")
+        return lines
+
+    def summary_line(self):
+        parts = []
+        for name in self.stages:
+            s = self.stats(name)
+            if s:
+                parts.append(f"{name}={s[0]:.1f}/{s[1]:.1f}")
+        parts += [f"{k}={v}" for k, v in self.counters.items()]
+        return "PERF p50/p99 ms: " + " ".join(parts)
+
+    def maybe_log(self, interval=30):
+        """Prints summary_line() at most every `interval` seconds."""
+        now = time.monotonic()
+        if now - self.last_log >= interval:
+            self.last_log = now
+            print(self.summary_line())
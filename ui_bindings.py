@@ -0,0 +1,40 @@
+_UNSET = object()
+
+
+class UiBindings:
+    """Remembers the options last pushed to each widget and only sends changes.
+
+    Every widget.config() call makes Tk re-measure and redraw the widget, even
+    when the text and colour are the same as before. Routing dashboard updates
+    through set() turns those into a dict comparison:
+
+        ui = UiBindings()
+        ui.set(lbl_speed, text=f"{speed} KPH", fg=color)  # config() only if either changed
+
+    `pushed` counts config() calls made, `suppressed` counts option updates
+    that were skipped because the widget already showed that value.
+    """
+
+    def __init__(self):
+        self.rendered = {}  # widget -> {option: value}
+        self.pushed = 0
+        self.suppressed = 0
+
+    def set(self, widget, **options):
+        """ Returns: True if the widget was reconfigured """
+        last = self.rendered.setdefault(widget, {})
+        changed = {k: v for k, v in options.items() if last.get(k, _UNSET) != v}
+        self.suppressed += len(options) - len(changed)
+        if not changed:
+            return False
+        widget.config(**changed)
+        last.update(changed)
+        self.pushed += 1
+        return True
+
+    def forget(self, widget=None):
+        """Drops the remembered state (of one widget, or all), e.g. after it was changed directly."""
+        if widget is None:
+            self.rendered.clear()
+        else:
+            self.rendered.pop(widget, None)
@@ -0,0 +1,193 @@
+import math
+
+from rolling_window import TimeEma
+
+G = 9.81  # m/s^2 per g
+
+# --- ESTIMATOR CONFIGURATION ---
+CALIBRATION_SECONDS = 2.0  # Startup window assumed stationary: gyro bias + gravity
+GRAVITY_TAU = 0.5  # Complementary filter: accelerometer correction of the gyro-tracked gravity while still
+MOVING_GRAVITY_TAU = 300.0  # ... and while moving, where sustained acceleration would otherwise leak into it
+STILL_TAU = 0.25  # Time constant of the vibration (accel std) estimate
+STILL_ACCEL_STD = 0.012  # g, below this the car is not vibrating/moving
+STILL_GYRO = 1.5  # deg/s (bias removed)
+STILL_LINEAR_ACC = 0.03  # g of gravity-removed acceleration; a smooth or purely longitudinal push is not still
+STILL_RESYNC_SECONDS = 20.0  # Quiet this long with a steady offset: take the offset as gravity error, not motion
+ZUPT_SECONDS = 0.5  # Stillness needed before velocity is forced to zero
+BIAS_TAU = 20.0  # Gyro bias keeps adapting slowly during zero-velocity periods
+VELOCITY_LEAK_TAU = 600.0  # Slow leak that bounds drift between zero-velocity updates
+TURN_RATE = 15  # deg/s of yaw that counts as turning
+TURN_HOLD_SECONDS = 1.0  # Hold the turn status this long to prevent flickering
+YAW_TAU = 0.1  # Low-pass on the yaw rate
+ACCELERATING_LEVEL = 0.15  # g of forward acceleration
+STATIONARY_KPH = 3.0
+MAX_SPEED_KPH = 200
+MAX_DT = 0.1  # A sample never integrates over more than this (stalls, I2C errors)
+
+
+def _ema(tau, dt):
+    return 1.0 - math.exp(-dt / tau) if tau > 0 else 1.0
+
+
+def _normalize(v):
+    n = math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    return (v[0] / n, v[1] / n, v[2] / n) if n > 0 else (0.0, 0.0, 1.0)
+
+
+class VehicleEstimator:
+    """Vehicle state and speed from all six IMU axes, one sample at a time.
+
+    - Startup: the first CALIBRATION_SECONDS (car assumed parked) give the
+      gyro bias and the gravity vector in sensor coordinates.
+    - Gravity is tracked with a complementary filter: rotated by the
+      bias-corrected gyro every sample, pulled towards the measured
+      acceleration - quickly while the car is still, very slowly while it
+      moves. Subtracting it leaves the linear acceleration, so a tilted
+      mount or a slope does not read as acceleration.
+    - Forward acceleration (sensor y axis, as before) is integrated into
+      speed. When the accelerometer shows no vibration, the gyro no
+      rotation and the gravity-removed acceleration stays under
+      STILL_LINEAR_ACC for ZUPT_SECONDS, a zero-velocity update resets the
+      speed and refines the gyro bias. No car holds a perfectly smooth
+      acceleration for STILL_RESYNC_SECONDS, so a quiet sensor with a
+      steady offset that long is taken as parked (and gravity re-synced).
+    - STATIONARY comes from that stillness detector (or a speed below
+      STATIONARY_KPH), not from the integrated speed alone.
+
+    Memory is constant: everything is a handful of running values.
+
+        status, speed_kph = estimator.update((ax, ay, az, gx, gy, gz), now)
+    """
+
+    def __init__(self, forward_axis=1):
+        self.forward_axis = forward_axis
+        self.reset()
+
+    def reset(self):
+        self.last_time = None
+        self.calibrated = False
+        self.calib_start = None
+        self.calib_n = 0
+        self.calib_acc = [0.0, 0.0, 0.0]
+        self.calib_gyro = [0.0, 0.0, 0.0]
+
+        self.gyro_bias = (0.0, 0.0, 0.0)
+        self.gravity = (0.0, 0.0, 1.0)  # Unit vector, sensor frame
+        self.gravity_g = 1.0  # Magnitude seen at rest (accelerometer scale error)
+        self.speed = 0.0  # m/s
+        self.forward_acc = 0.0  # g, gravity removed
+        self.yaw = TimeEma(YAW_TAU)  # deg/s, bias removed, low-passed
+
+        self.acc_mean = 1.0
+        self.acc_var = 0.0
+        self.still_since = None
+        self.quiet_since = None  # No vibration / rotation, whatever the linear acceleration
+        self.zero_velocity = True
+        self.turn_timer = None
+        self.turn_direction = "TURNING"
+
+        # Counters
+        self.zupts = 0
+
+    @property
+    def speed_kph(self):
+        return self.speed * 3.6
+
+    def _calibrate(self, acc, gyro, now):
+        if self.calib_start is None:
+            self.calib_start = now
+        self.calib_n += 1
+        for i in range(3):
+            self.calib_acc[i] += acc[i]
+            self.calib_gyro[i] += gyro[i]
+        if now - self.calib_start < CALIBRATION_SECONDS:
+            return False
+
+        n = self.calib_n
+        mean_acc = [a / n for a in self.calib_acc]
+        self.gyro_bias = tuple(g / n for g in self.calib_gyro)
+        self.gravity = _normalize(mean_acc)
+        self.gravity_g = math.sqrt(sum(a * a for a in mean_acc)) or 1.0
+        self.acc_mean = self.gravity_g
+        self.calibrated = True
+        return True
+
+    def update(self, sample, now):
+        """sample: ax, ay, az (g), gx, gy, gz (deg/s). Returns: status_string, speed_kph"""
+        acc = sample[:3]
+        gyro_raw = sample[3:]
+        dt = min(max(now - self.last_time, 0.0), MAX_DT) if self.last_time is not None else 0.0
+        self.last_time = now
+
+        if not self.calibrated:
+            self._calibrate(acc, gyro_raw, now)
+            return "STATIONARY", 0
+
+        gyro = [gyro_raw[i] - self.gyro_bias[i] for i in range(3)]
+
+        # --- GRAVITY PREDICTION ---
+        # Rotating the sensor by w moves a fixed world vector by -w x g in sensor coordinates
+        wx, wy, wz = (math.radians(g) * dt for g in gyro)
+        gx, gy, gz = self.gravity
+        predicted = (gx - (wy * gz - wz * gy), gy - (wz * gx - wx * gz), gz - (wx * gy - wy * gx))
+        linear = [acc[i] - predicted[i] * self.gravity_g for i in range(3)]
+
+        # --- STILLNESS / ZERO-VELOCITY UPDATE ---
+        norm = math.sqrt(acc[0] * acc[0] + acc[1] * acc[1] + acc[2] * acc[2])
+        a = _ema(STILL_TAU, dt)
+        diff = norm - self.acc_mean
+        self.acc_mean += a * diff
+        self.acc_var = (1 - a) * (self.acc_var + a * diff * diff)
+        rotating = max(abs(g) for g in gyro) > STILL_GYRO
+        quiet = not rotating and math.sqrt(self.acc_var) < STILL_ACCEL_STD
+        # |acc| is dominated by gravity, so it hides a smooth or longitudinal push: check the linear part too
+        pushed = math.sqrt(sum(x * x for x in linear)) >= STILL_LINEAR_ACC
+
+        if quiet:
+            if self.quiet_since is None:
+                self.quiet_since = now
+        else:
+            self.quiet_since = None
+        resync = self.quiet_since is not None and now - self.quiet_since >= STILL_RESYNC_SECONDS
+        if quiet and (not pushed or resync):
+            if self.still_since is None:
+                self.still_since = now
+        else:
+            self.still_since = None
+        self.zero_velocity = self.still_since is not None and now - self.still_since >= ZUPT_SECONDS
+
+        # --- GRAVITY CORRECTION (complementary filter) ---
+        measured = _normalize(acc)
+        k = _ema(GRAVITY_TAU if self.zero_velocity else MOVING_GRAVITY_TAU, dt)
+        self.gravity = _normalize([predicted[i] + k * (measured[i] - predicted[i]) for i in range(3)])
+
+        linear = [acc[i] - self.gravity[i] * self.gravity_g for i in range(3)]
+        self.forward_acc = linear[self.forward_axis]
+
+        if self.zero_velocity:
+            if self.speed != 0.0:
+                self.zupts += 1
+            self.speed = 0.0
+            b = _ema(BIAS_TAU, dt)
+            self.gyro_bias = tuple(self.gyro_bias[i] + b * gyro[i] for i in range(3))
+        else:
+            self.speed += self.forward_acc * G * dt
+            self.speed *= 1.0 - _ema(VELOCITY_LEAK_TAU, dt)
+            self.speed = min(max(self.speed, 0.0), MAX_SPEED_KPH / 3.6)
+
+        # --- TURNING ---
+        yaw_rate = self.yaw.update(now, gyro[2])
+        if abs(yaw_rate) > TURN_RATE:
+            self.turn_timer = now
+            # Standard MPU: + is Left, - is Right
+            self.turn_direction = "TURNING LEFT" if yaw_rate > 0 else "TURNING RIGHT"
+
+        # --- STATUS DECISION ---
+        speed_kph = self.speed_kph
+        if self.turn_timer is not None and now - self.turn_timer < TURN_HOLD_SECONDS:
+            return self.turn_direction, speed_kph
+        if self.zero_velocity or speed_kph < STATIONARY_KPH:
+            return "STATIONARY", 0
+        if self.forward_acc > ACCELERATING_LEVEL:
+            return "ACCELERATING", speed_kph
+        return "DRIVING", speed_kph
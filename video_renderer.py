@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class VideoRenderer:
+    """Shows camera frames in a Tk label through one persistent PhotoImage.
+
+    The resize target, the RGBA buffer, a block image in the photo's own
+    mode and the Tk photo are allocated once per display size. Per frame:
+    cv2.resize and cv2.cvtColor into the buffers, a row copy of the RGBA
+    buffer into the block image (same 4-byte pixels, so no conversion) and
+    a paste of that into the photo. PhotoImage.paste only blits a block
+    image whose mode matches the photo's; anything else makes it allocate
+    and convert a temporary copy every call. The label is only reconfigured
+    when the size changes.
+
+        small = renderer.resize(frame, (w, h))  # draw overlays on `small` if needed
+        renderer.show()
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.size = None
+        self.resized = None
+        self.rgba = None
+        self.pil = None
+        self.block = None
+        self.photo = None
+
+        self.reallocations = 0
+
+    def _allocate(self, size):
+        w, h = size
+        self.size = size
+        self.resized = np.empty((h, w, 3), dtype=np.uint8)
+        self.rgba = np.empty((h, w, 4), dtype=np.uint8)
+        # Shares memory with self.rgba, no copy when the buffer changes
+        self.pil = Image.frombuffer("RGBA", (w, h), self.rgba, "raw", "RGBA", 0, 1)
+        # Image.new() images are not single-block, so the photo would not take them as they are
+        self.block = Image.Image()._new(Image.core.new_block("RGB", (w, h)))
+        self.photo = ImageTk.PhotoImage("RGB", (w, h))
+        self.label.imgtk = self.photo
+        self.label.configure(image=self.photo)
+        self.reallocations += 1
+
+    def resize(self, frame, size):
+        """ Returns: the persistent resized BGR buffer (valid until the next call) """
+        if size != self.size:
+            self._allocate(size)
+        cv2.resize(frame, self.size, dst=self.resized)
+        return self.resized
+
+    def show(self):
+        cv2.cvtColor(self.resized, cv2.COLOR_BGR2RGBA, dst=self.rgba)
+        self.block.im.paste(self.pil.im, (0, 0) + self.size)
+        self.photo.paste(self.block)
+
+    def render(self, frame, size):
+        self.resize(frame, size)
+        self.show()